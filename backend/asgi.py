@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after setup: the stream app uses models.
+from base.notifications import NotificationStreamApp  # noqa: E402
+
+application = NotificationStreamApp(django_application)
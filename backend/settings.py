@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -49,6 +50,27 @@ AUTH_USER_MODEL = 'base.CustomUser'
 
 SITE_ID = 1  # or another valid ID
 
+# Authenticator chains for endpoint groups; views pick one with
+# base.authentication.authentication_profile(<profile>). Endpoints without a
+# profile use DEFAULT_AUTHENTICATION_CLASSES below.
+AUTHENTICATION_PROFILES = {
+    # Mobile app endpoints: bearer tokens only, no password hashing per call.
+    'token': [
+        'base.authentication.CachedJWTAuthentication',
+    ],
+    # Admin-facing API used from the browser as well as the app.
+    'staff': [
+        'rest_framework.authentication.SessionAuthentication',
+        'base.authentication.CachedJWTAuthentication',
+    ],
+    # Login, registration and verification: never authenticate the caller.
+    'public': [],
+}
+
+# Users resolved from JWTs are cached per process for this many seconds.
+JWT_USER_CACHE_TTL = 5
+JWT_USER_CACHE_SIZE = 10000
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
@@ -58,7 +80,57 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # Reverse proxies in front of the app. Client IPs (for throttling) are read
+    # from X-Forwarded-For only as far back as this many trusted hops; 0 uses
+    # the connection's address.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+    # The first renderer is also used by the async views (base.renderers.render_json).
+    'DEFAULT_RENDERER_CLASSES': [
+        'base.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Token-bucket throttles (base.throttling), per client IP and per account.
+# '10/min' allows a burst of 10 requests, refilled evenly over a minute; a
+# missing entry disables that bucket. Rejected requests get 429 + Retry-After.
+THROTTLE_RATES = {
+    'login': {'ip': '30/min', 'account': '10/min'},
+    'verify-user': {'ip': '30/min', 'account': '10/min'},
+    'verify-password': {'ip': '30/min', 'account': '10/min'},
+    'transfer': {'ip': '60/min', 'account': '30/min'},
+    'create-order': {'ip': '60/min', 'account': '30/min'},
 }
+# Buckets are kept per process, for at most this many IPs and accounts.
+THROTTLE_MAX_KEYS = 20000
+# With several workers, name a CACHES alias shared by all of them (for example
+# a FileBasedCache or DatabaseCache) to also enforce the rates across workers.
+THROTTLE_SHARED_CACHE = os.environ.get('THROTTLE_SHARED_CACHE') or None
+
+# Default page size for keyset-paginated history endpoints (?page_size= overrides, up to 100)
+TRANSACTION_PAGE_SIZE = 20
+
+# Responses to requests carrying an Idempotency-Key header are replayed for
+# retries of the same key within this many seconds. The store is per process.
+IDEMPOTENCY_KEY_TTL = 60 * 60 * 24
+IDEMPOTENCY_MAX_KEYS = 10000
+# How long a retry waits for the first request with its key to finish.
+IDEMPOTENCY_WAIT_TIMEOUT = 30
+
+# notifications/since/ returns at most this many rows per call (?limit= up to 100).
+NOTIFICATION_PAGE_SIZE = 50
+# notifications/stream/ (ASGI only): while any stream is open, each process
+# checks this often for rows created by other workers, and every stream sends
+# a keepalive comment after this much silence.
+NOTIFICATION_STREAM_POLL_INTERVAL = 5
+NOTIFICATION_STREAM_KEEPALIVE = 15
+
+# Results per page of search/.
+SEARCH_PAGE_SIZE = 20
+
+# Default and longest date range, in days, served by vendor/analytics/.
+VENDOR_ANALYTICS_DAYS = 30
+VENDOR_ANALYTICS_MAX_DAYS = 366
 
 # Include JWT settings
 from datetime import timedelta
@@ -75,8 +147,10 @@ SIMPLE_JWT = {
 }
 
 MIDDLEWARE = [
+    'base.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'base.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -85,6 +159,20 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Per-route request metrics (base.metrics), served to admins at metrics/.
+# Every request records latency and response size; this fraction of requests
+# also counts database queries and their time.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+METRICS_SAMPLE_RATE = float(os.environ.get('METRICS_SAMPLE_RATE', '1.0'))
+# Label combinations (route, method, status) kept per process.
+METRICS_MAX_SERIES = 2000
+
+# Responses at least this large are compressed for clients that accept it:
+# brotli when the optional `brotli` package is installed, gzip otherwise.
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI = True
+COMPRESSION_BROTLI_QUALITY = 5
+
 CORS_ALLOWED_ORIGINS = [
     'http://localhost:19006', # Expo Go on localhost
     # 'http://<Machine-IP>:19006', # Expo Go on local network IP
@@ -128,17 +216,94 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'backend.wsgi.application'
 
+# Serve canteens/, categories/<id>/foods/, featured-foods/, balance/ and
+# orders/ with the async views in base/async_views.py. Only worth enabling
+# when running under ASGI (e.g. `uvicorn backend.asgi:application`).
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS') == '1'
+
+# transactions/ and orders/ build their rows from plain column values
+# (base/projections.py) instead of running a ModelSerializer per row. The
+# output is the same either way; set PROJECTION_SERIALIZERS=0 to compare.
+PROJECTION_SERIALIZERS = os.environ.get('PROJECTION_SERIALIZERS', '1') == '1'
+
 
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Pick one with the DATABASE_PROFILE environment variable:
+#   sqlite        - SQLite tuned for concurrent writers (default)
+#   sqlite-basic  - Django's stock SQLite settings
+#   postgres      - PostgreSQL with persistent, health-checked connections;
+#                   set POSTGRES_POOLER=1 when connecting through PgBouncer in
+#                   transaction pooling mode.
+#
+# The SQLite profiles use the checked-in development database unless
+# SQLITE_PATH names another file. WAL mode is stored in the database file
+# itself, so it is only switched on for other files: turning it on for the
+# checked-in one would rewrite its header and dirty the working tree.
+
+DEV_SQLITE_PATH = BASE_DIR / 'db.sqlite3'
+SQLITE_PATH = Path(os.environ['SQLITE_PATH']) if os.environ.get('SQLITE_PATH') else DEV_SQLITE_PATH
+
+DATABASE_PROFILES = {
+    'sqlite': {
+        'ENGINE': 'base.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+        'OPTIONS': {
+            # Seconds a writer waits for the lock before "database is locked".
+            'timeout': 20,
+            'transaction_mode': 'IMMEDIATE',
+            'init_command': (
+                ('PRAGMA journal_mode=WAL;' if SQLITE_PATH != DEV_SQLITE_PATH else '')
+                + 'PRAGMA synchronous=NORMAL;'
+                'PRAGMA cache_size=-20000;'
+                'PRAGMA temp_store=MEMORY;'
+                'PRAGMA mmap_size=134217728'
+            ),
+        },
+    },
+    'sqlite-basic': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': SQLITE_PATH,
+    },
+    'postgres': {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('POSTGRES_DB', 'juanbytes'),
+        'USER': os.environ.get('POSTGRES_USER', 'juanbytes'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('POSTGRES_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        # Server-side cursors do not survive transaction pooling.
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('POSTGRES_POOLER') == '1',
+    },
+}
+
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
 DATABASES = {
+    'default': dict(DATABASE_PROFILES[DATABASE_PROFILE]),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Local memory is per process; with several workers switch to
+# 'django.core.cache.backends.filebased.FileBasedCache' with a shared LOCATION
+# so that a menu edit invalidates the cached menu in every worker.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'juanbytes',
     }
 }
 
+# Serialized menu responses are keyed by menu version, so this only bounds how
+# long unused versions linger.
+MENU_CACHE_TIMEOUT = 60 * 60 * 24
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -159,6 +324,22 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Password hashing
+# https://docs.djangoproject.com/en/4.1/topics/auth/passwords/
+# New passwords use the first hasher. Hashes made by the others still verify
+# and are re-encoded with the first one on the user's next successful login.
+# scrypt is memory-hard and several times cheaper in CPU per login than
+# PBKDF2's defaults; with argon2-cffi installed Argon2 can be moved first.
+
+PASSWORD_HASHERS = [
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.1/topics/i18n/
 
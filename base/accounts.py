@@ -0,0 +1,36 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+
+User = get_user_model()
+
+
+def find_user(email=None, phone_number=None):
+    """Look up a login candidate by email, or by phone number if no email is given."""
+    if email:
+        lookup = {'email': User.objects.normalize_email(email)}
+    elif phone_number:
+        lookup = {'phone_number': phone_number}
+    else:
+        return None
+    return User.objects.filter(**lookup).first()
+
+
+def check_credentials(user, password):
+    """Hash ``password`` exactly once and return the user if it matches.
+
+    ``user.check_password`` re-encodes the password with the preferred hasher
+    on success when the stored hash uses an older one, so accounts migrate to
+    ``PASSWORD_HASHERS[0]`` as people log in.
+    """
+    if user is None:
+        # Spend the same hashing time as a real check so response timing does
+        # not reveal which accounts exist.
+        make_password(password)
+        return None
+    if user.check_password(password) and user.is_active:
+        return user
+    return None
+
+
+def authenticate_user(password, email=None, phone_number=None):
+    return check_credentials(find_user(email=email, phone_number=phone_number), password)
@@ -1,6 +1,12 @@
-from django.contrib import admin
-from .models import CustomUser, Transaction, Notification, TopUpRequest, Canteen, FoodCategory, Food, Order, FeaturedFood
+from django import forms
+from django.contrib import admin, messages
+from .models import CustomUser, Transaction, Notification, TopUpRequest, Canteen, FoodCategory, Food, Order, FeaturedFood, \
+    LedgerEntry, BalanceCheckpoint
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.db import transaction
+from .featured import set_approval
+from .ledger import record_adjustment
+from .payments import approve_top_up, approve_top_ups, TransferError
 
 class UserAdmin(BaseUserAdmin):
     model = CustomUser
@@ -27,35 +33,76 @@ class UserAdmin(BaseUserAdmin):
         if obj.height and obj.weight:
             height_in_meters = obj.height / 100
             obj.bmi = round(obj.weight / (height_in_meters ** 2), 2)
-        super().save_model(request, obj, form, change)
+        if change and 'balance' in form.changed_data:
+            # Record the edit as a ledger adjustment against the balance as it
+            # is in the database, not as it was when the form was loaded.
+            with transaction.atomic():
+                previous = CustomUser.objects.select_for_update().values_list('balance', flat=True).get(pk=obj.pk)
+                super().save_model(request, obj, form, change)
+                record_adjustment(obj.pk, obj.balance - previous)
+        else:
+            super().save_model(request, obj, form, change)
+
+class CategoryListFilter(admin.RelatedFieldListFilter):
+    # FoodCategory.__str__ includes the canteen name.
+    def field_choices(self, field, request, model_admin):
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        categories = FoodCategory.objects.select_related('canteen').order_by(*ordering)
+        return [(category.pk, str(category)) for category in categories]
 
 class TransactionAdmin(admin.ModelAdmin):
     list_display = ('sender', 'recipient', 'amount', 'date')
+    list_select_related = ('sender', 'recipient')
     list_filter = ('date',)
     search_fields = ('sender__email', 'recipient__email', 'amount')
 
 
+class TopUpRequestChangeListForm(forms.ModelForm):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.instance.is_approved:
+            # Unticking would leave the credit in place, and ticking again credit twice.
+            self.fields['is_approved'].disabled = True
+
+
 class TopUpRequestAdmin(admin.ModelAdmin):
     list_display = ('id', 'user_first_name', 'user', 'amount', 'is_approved', 'created_at', 'user_balance')
     list_editable = ('is_approved',)  
     list_filter = ('is_approved',)    
     search_fields = ('user__email',)  
+    list_select_related = ('user',)
+    actions = ['approve_selected']
+
+    @admin.action(description="Approve selected top-up requests")
+    def approve_selected(self, request, queryset):
+        try:
+            approved = approve_top_ups(queryset.values_list('pk', flat=True))
+        except TransferError as e:
+            self.message_user(request, str(e), level=messages.ERROR)
+            return
+        users = len({top_up.user_id for top_up in approved})
+        self.message_user(request, f"Approved {len(approved)} top-up request(s) for {users} user(s).")
 
     def user_balance(self, obj):
         return obj.user.balance
     user_balance.short_description = 'User Balance'
 
-    def save_model(self, request, obj, form, change):
-        if 'is_approved' in form.changed_data and obj.is_approved:
-            from django.db import transaction
+    def get_changelist_form(self, request, **kwargs):
+        return super().get_changelist_form(request, form=TopUpRequestChangeListForm, **kwargs)
 
-            with transaction.atomic():
-                user = obj.user
-                user.balance += obj.amount
-                user.save()
+    def save_model(self, request, obj, form, change):
+        approve = 'is_approved' in form.changed_data and obj.is_approved
+        if approve:
+            # Saved as pending first so that approve_top_up credits it exactly once.
+            obj.is_approved = False
         super().save_model(request, obj, form, change)
+        if approve:
+            approve_top_up(obj.pk)
+            obj.is_approved = True
 
     def get_readonly_fields(self, request, obj=None):
+        if obj and obj.is_approved:
+            return ('id', 'user', 'amount', 'is_approved', 'created_at', 'user_balance')
         if obj: 
             return ('id', 'user', 'amount', 'created_at', 'user_balance')  
         return super().get_readonly_fields(request, obj)
@@ -70,23 +117,67 @@ class FoodCategoryAdmin(admin.ModelAdmin):
     list_display = ['name', 'canteen']
     search_fields = ['name', 'canteen__name']
     list_filter = ['canteen']
+    list_select_related = ['canteen']
 
 @admin.register(Food)
 class FoodAdmin(admin.ModelAdmin):
     list_display = ['name', 'description', 'price', 'category']
     search_fields = ['name', 'category__name', 'category__canteen__name']
-    list_filter = ['category', 'category__canteen']
+    list_filter = [('category', CategoryListFilter), 'category__canteen']
+    list_select_related = ['category__canteen']
+    actions = ['approve_selected', 'unapprove_selected']
+
+    @admin.action(description="Approve and feature selected foods", permissions=['change'])
+    def approve_selected(self, request, queryset):
+        changed = set_approval(queryset.values_list('pk', flat=True), True)
+        self.message_user(request, f"Approved {changed} food(s).")
+
+    @admin.action(description="Unapprove and unfeature selected foods", permissions=['change'])
+    def unapprove_selected(self, request, queryset):
+        changed = set_approval(queryset.values_list('pk', flat=True), False)
+        self.message_user(request, f"Unapproved {changed} food(s).")
 
 @admin.register(FeaturedFood)
 class FeaturedFoodAdmin(admin.ModelAdmin):
     list_display = ['food']
     search_fields = ['food__name']
+    list_select_related = ['food']
 
 @admin.register(Order)
 class OrderAdmin(admin.ModelAdmin):
     list_display = ['user', 'food', 'quantity', 'total_price', 'created_at']
-    search_fields = ['user__username', 'food__name']
-    list_filter = ['created_at', 'food__category', 'food__category__canteen']
+    search_fields = ['user__email', 'user__phone_number', 'food__name']
+    list_filter = ['created_at', ('food__category', CategoryListFilter), 'food__category__canteen']
+    list_select_related = ['user', 'food']
+
+    def get_readonly_fields(self, request, obj=None):
+        # Orders are paid through the API, which moves the money and updates
+        # the sales rollups; editing these here would do neither.
+        if obj:
+            return ('food', 'quantity', 'total_price', 'vendor', 'is_paid')
+        return super().get_readonly_fields(request, obj)
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'kind', 'amount', 'transaction', 'top_up', 'created_at']
+    list_filter = ['kind']
+    search_fields = ['user__email', 'user__phone_number']
+    list_select_related = ['user', 'transaction__sender', 'transaction__recipient', 'top_up__user']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(BalanceCheckpoint)
+class BalanceCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['user', 'entry_id', 'balance', 'created_at']
+    search_fields = ['user__email', 'user__phone_number']
+    list_select_related = ['user']
 
 admin.site.register(CustomUser, UserAdmin)
 admin.site.register(Transaction, TransactionAdmin)
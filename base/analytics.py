@@ -0,0 +1,104 @@
+"""Vendor sales rollups.
+
+Every order adds to one ``VendorSalesRollup`` row per vendor, food and day
+when it is created, and again when it is paid, so the analytics endpoint
+reads a handful of rollup rows instead of grouping the whole Order table.
+Callers run these inside the transaction that writes the order.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.db.models.signals import post_save
+from django.utils import timezone
+
+from .localtime import LOCAL_TIMEZONE
+from .models import Order, VendorSalesRollup
+
+ROLLUP_FIELDS = ('orders', 'items', 'revenue', 'paid_orders', 'paid_revenue')
+
+
+def _key(order):
+    return order.vendor_id, timezone.localdate(order.created_at, LOCAL_TIMEZONE), order.food_id
+
+
+def _add(deltas, key, **amounts):
+    delta = deltas.setdefault(key, dict.fromkeys(ROLLUP_FIELDS, 0))
+    for field, amount in amounts.items():
+        delta[field] += amount
+
+
+def order_deltas(orders):
+    """Sum new orders into ``{(vendor_id, day, food_id): {field: amount}}``."""
+    deltas = {}
+    for order in orders:
+        if order.vendor_id is None:
+            continue
+        _add(deltas, _key(order), orders=1, items=order.quantity, revenue=order.total_price)
+        if order.is_paid:
+            _add(deltas, _key(order), paid_orders=1, paid_revenue=order.total_price)
+    return deltas
+
+
+def _update(key, delta):
+    vendor_id, day, food_id = key
+    updates = {field: F(field) + amount for field, amount in delta.items() if amount}
+    return VendorSalesRollup.objects.filter(vendor_id=vendor_id, day=day, food_id=food_id).update(**updates)
+
+
+def apply_deltas(deltas):
+    missing = {key: delta for key, delta in deltas.items() if not _update(key, delta)}
+    if not missing:
+        return
+    try:
+        with transaction.atomic():
+            VendorSalesRollup.objects.bulk_create([
+                VendorSalesRollup(vendor_id=vendor_id, day=day, food_id=food_id, **delta)
+                for (vendor_id, day, food_id), delta in missing.items()
+            ])
+    except IntegrityError:
+        # Another order for the same day created some of the rows first.
+        for key, delta in missing.items():
+            if not _update(key, delta):
+                vendor_id, day, food_id = key
+                VendorSalesRollup.objects.create(vendor_id=vendor_id, day=day, food_id=food_id, **delta)
+
+
+def record_orders(orders):
+    apply_deltas(order_deltas(orders))
+
+
+def record_payment(order):
+    if order.vendor_id is not None:
+        deltas = {}
+        _add(deltas, _key(order), paid_orders=1, paid_revenue=order.total_price)
+        apply_deltas(deltas)
+
+
+def _record_created_order(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_orders([instance])
+
+
+def connect_signals():
+    # Single creates (the order endpoint, the admin) arrive here; bulk
+    # creates skip post_save and call record_orders() themselves.
+    post_save.connect(_record_created_order, sender=Order, dispatch_uid='vendor-sales-rollup-order')
+
+
+def vendor_summary(vendor, start, end, top=10):
+    rollups = VendorSalesRollup.objects.filter(vendor=vendor, day__gte=start, day__lte=end)
+    sums = {field: Sum(field) for field in ROLLUP_FIELDS}
+
+    daily = list(rollups.values('day').annotate(**sums).order_by('day'))
+    top_items = list(
+        rollups.values('food_id', 'food__name').annotate(**sums).order_by('-revenue', 'food_id')[:top]
+    )
+    totals = {field: sum((row[field] for row in daily), 0) for field in ROLLUP_FIELDS}
+    return {
+        'start': start,
+        'end': end,
+        'totals': totals,
+        'daily': daily,
+        'top_items': [
+            {'food': row.pop('food_id'), 'name': row.pop('food__name'), **row} for row in top_items
+        ],
+    }
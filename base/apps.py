@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class BaseConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'base'
+
+    def ready(self):
+        from . import analytics, authentication, menu_cache, menu_snapshot, metrics, notifications, search
+        analytics.connect_signals()
+        authentication.connect_signals()
+        menu_cache.connect_signals()
+        menu_snapshot.connect_signals()
+        metrics.connect_signals()
+        notifications.connect_signals()
+        search.connect_signals()
@@ -0,0 +1,131 @@
+"""Async versions of the read-heavy endpoints, for ASGI deployments.
+
+They return the same JSON as the DRF views in ``views.py`` but use the async
+ORM and the async cache API, so a worker does not hold a thread while a
+request waits on the database or the cache. ``settings.ASYNC_READ_VIEWS``
+selects them in ``urls.py``.
+Authentication is JWT only (the ``token`` profile).
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseNotModified
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .authentication import CachedJWTAuthentication
+from .menu_cache import aget_menu_version, menu_etag, etag_matches, menu_cache_key, set_menu_headers
+from .models import Canteen, Food, FeaturedFood, Order
+from .projections import aorder_rows
+from .renderers import render_json
+from .serializers import CanteenSerializer, FoodSerializer, FeaturedFoodSerializer, OrderSerializer
+
+
+def json_response(data, status=status.HTTP_200_OK, **kwargs):
+    # Encode with the API's renderer so both stacks return the same body.
+    return HttpResponse(render_json(data), status=status, content_type='application/json', **kwargs)
+
+
+class AsyncAPIView(View):
+    authenticator = CachedJWTAuthentication()
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            result = await self.authenticator.aauthenticate(request)
+        except APIException as e:
+            return self.unauthorized(request, e.detail)
+        if result is None:
+            return self.unauthorized(request, "Authentication credentials were not provided.")
+        request.user, request.auth = result
+        return await super().dispatch(request, *args, **kwargs)
+
+    def unauthorized(self, request, detail):
+        response = json_response({'detail': detail}, status=status.HTTP_401_UNAUTHORIZED)
+        response['WWW-Authenticate'] = self.authenticator.authenticate_header(request)
+        return response
+
+
+# Cache keys being rebuilt in this process, so a miss is built by one request.
+_building = {}
+
+
+class AsyncMenuView(AsyncAPIView):
+    """Async counterpart of ``MenuCacheMixin``, sharing its cache entries.
+
+    Concurrent misses on the same entry wait for the first request's build
+    instead of each querying the database.
+    """
+    queryset = None
+    serializer_class = None
+
+    def get_queryset(self):
+        # .all() so that each request evaluates a fresh queryset.
+        return self.queryset.all()
+
+    async def get(self, request, *args, **kwargs):
+        version = await aget_menu_version()
+        etag = menu_etag(version)
+
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        else:
+            key = menu_cache_key(version, request)
+            data = await cache.aget(key)
+            if data is None:
+                data = await self.build_once(key)
+            response = json_response(data)
+
+        return set_menu_headers(response, etag)
+
+    async def build_once(self, key):
+        building = _building.get(key)
+        if building is None:
+            building = _building[key] = asyncio.ensure_future(self.build(key))
+            building.add_done_callback(lambda _: _building.pop(key, None))
+        # Shielded: a client that disconnects does not cancel the others' build.
+        return await asyncio.shield(building)
+
+    async def build(self, key):
+        data = [self.serializer_class(obj).data async for obj in self.get_queryset()]
+        await cache.aset(key, data, timeout=settings.MENU_CACHE_TIMEOUT)
+        return data
+
+
+class CanteenListView(AsyncMenuView):
+    queryset = Canteen.objects.all()
+    serializer_class = CanteenSerializer
+
+
+class FoodListView(AsyncMenuView):
+    queryset = Food.objects.select_related('category__canteen', 'vendor')
+    serializer_class = FoodSerializer
+
+    def get_queryset(self):
+        return super().get_queryset().filter(category_id=self.kwargs['category_id'])
+
+
+class FeaturedFoodListView(AsyncMenuView):
+    queryset = FeaturedFood.objects.select_related('food__category__canteen', 'food__vendor')
+    serializer_class = FeaturedFoodSerializer
+
+
+class UserBalanceView(AsyncAPIView):
+    async def get(self, request):
+        return json_response({
+            'balance': request.user.balance,
+            'first_name': request.user.first_name,
+        })
+
+
+class OrderListView(AsyncAPIView):
+    async def get(self, request):
+        user = request.user
+        orders = Order.objects.select_related('user', 'vendor', 'food__category__canteen', 'food__vendor')
+        orders = orders.filter(vendor=user) if user.is_staff else orders.filter(user=user)
+        orders = orders.order_by('-created_at')
+        if settings.PROJECTION_SERIALIZERS:
+            return json_response(await aorder_rows(orders))
+        data = [OrderSerializer(order).data async for order in orders]
+        return json_response(data)
@@ -0,0 +1,90 @@
+import copy
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+
+from .lru import TTLCache
+
+User = get_user_model()
+
+_users = TTLCache(maxsize=settings.JWT_USER_CACHE_SIZE, ttl=settings.JWT_USER_CACHE_TTL)
+
+
+def authentication_profile(profile):
+    """Return the authenticator chain configured for an endpoint group.
+
+    Profiles live in ``settings.AUTHENTICATION_PROFILES`` so that, say, the
+    mobile API can run JWT alone while the browsable admin API keeps sessions.
+    """
+    return [import_string(path) for path in settings.AUTHENTICATION_PROFILES[profile]]
+
+
+def forget_users(*user_ids):
+    for user_id in user_ids:
+        _users.delete(user_id)
+
+
+def _forget_saved_user(sender, instance, **kwargs):
+    forget_users(instance.pk)
+
+
+def connect_signals():
+    post_save.connect(_forget_saved_user, sender=User, dispatch_uid='jwt-user-cache-save')
+    post_delete.connect(_forget_saved_user, sender=User, dispatch_uid='jwt-user-cache-delete')
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWT authentication that resolves users through a short-lived cache.
+
+    The cache is per process and bounded by ``JWT_USER_CACHE_SIZE``. Entries
+    are dropped when the user row is saved or deleted and when money moves,
+    and otherwise expire after ``JWT_USER_CACHE_TTL`` seconds, which bounds
+    how stale a change made by another worker can look.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        cached = _users.get(user_id) if user_id is not None else None
+        if cached is None:
+            user = super().get_user(validated_token)
+            _users.set(user_id, user)
+            cached = user
+        elif not cached.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        # Views may change request.user, so each request gets its own copy.
+        return copy.copy(cached)
+
+    async def aauthenticate(self, request):
+        """``authenticate()`` for async views: same checks, async ORM on a cache miss."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        cached = _users.get(user_id)
+        if cached is None:
+            try:
+                cached = await self.user_model.objects.aget(**{jwt_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed("User not found", code="user_not_found")
+            if not cached.is_active:
+                raise AuthenticationFailed("User is inactive", code="user_inactive")
+            _users.set(user_id, cached)
+        elif not cached.is_active:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        return copy.copy(cached)
@@ -0,0 +1,33 @@
+"""SQLite backend with the connection options Django 5.1 adds natively.
+
+``OPTIONS['init_command']`` is a ``;``-separated list of statements (PRAGMAs)
+run on every new connection, and ``OPTIONS['transaction_mode']`` chooses how
+``transaction.atomic()`` opens a transaction. ``IMMEDIATE`` takes the write
+lock at BEGIN, so a transaction that reads and then writes waits on the busy
+timeout instead of failing with "database is locked" when it upgrades.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    transaction_modes = frozenset(['DEFERRED', 'IMMEDIATE', 'EXCLUSIVE'])
+    init_commands = ()
+    transaction_mode = 'DEFERRED'
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        init_command = kwargs.pop('init_command', '')
+        self.init_commands = [command.strip() for command in init_command.split(';') if command.strip()]
+        self.transaction_mode = (kwargs.pop('transaction_mode', None) or 'DEFERRED').upper()
+        if self.transaction_mode not in self.transaction_modes:
+            raise ValueError(f"Unknown SQLite transaction_mode {self.transaction_mode!r}.")
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for command in self.init_commands:
+            conn.execute(command)
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.transaction_mode}")
@@ -0,0 +1,48 @@
+"""Keeping FeaturedFood in step with Food.is_approved in bulk.
+
+A food is featured exactly when it is approved. ``Food.save()`` keeps single
+saves in sync; ``set_approval`` changes many foods at once with one UPDATE,
+one INSERT and one DELETE, and ``repair`` fixes rows that drifted through
+``QuerySet.update()`` or bulk imports.
+"""
+from django.db import transaction
+
+from .menu_cache import bump_menu_version
+from .models import Food, FeaturedFood
+
+
+def set_approval(food_ids, approved):
+    """Approve or unapprove the given foods. Returns how many changed."""
+    food_ids = list(food_ids)
+    with transaction.atomic():
+        changed = Food.objects.filter(pk__in=food_ids).exclude(is_approved=approved).update(is_approved=approved)
+        if approved:
+            existing = Food.objects.filter(pk__in=food_ids).values_list('pk', flat=True)
+            FeaturedFood.objects.bulk_create([FeaturedFood(food_id=pk) for pk in existing], ignore_conflicts=True)
+        else:
+            FeaturedFood.objects.filter(food_id__in=food_ids).delete()
+        # bulk_create and update() send no signals.
+        transaction.on_commit(bump_menu_version)
+    return changed
+
+
+def find_drift():
+    """Querysets of approved foods that are not featured and featured foods that are not approved."""
+    return (Food.objects.filter(is_approved=True, featured__isnull=True),
+            FeaturedFood.objects.filter(food__is_approved=False))
+
+
+def repair(batch_size=1000):
+    """Fix drift in place. Returns ``(added, removed)``."""
+    missing, stale = find_drift()
+    added = 0
+    with transaction.atomic():
+        removed, _ = stale.delete()
+        ids = list(missing.values_list('pk', flat=True))
+        for start in range(0, len(ids), batch_size):
+            batch = ids[start:start + batch_size]
+            FeaturedFood.objects.bulk_create([FeaturedFood(food_id=pk) for pk in batch], ignore_conflicts=True)
+            added += len(batch)
+        if added or removed:
+            transaction.on_commit(bump_menu_version)
+    return added, removed
@@ -0,0 +1,105 @@
+import hashlib
+import threading
+from functools import wraps
+
+from django.conf import settings
+from django.http.request import RawPostDataException
+from rest_framework import status
+from rest_framework.response import Response
+
+from .lru import TTLCache
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+
+class IdempotencyStore:
+    """Remembers the first response for each idempotency key.
+
+    A request whose key is still being handled by another thread waits for
+    that result instead of running the view a second time. The store is per
+    process, so a retry must reach the same worker to be deduplicated.
+
+    Each key also remembers a fingerprint of the request it was first used
+    with; reusing the key for a different request gets 422 instead of the
+    first request's response.
+    """
+
+    def __init__(self):
+        self.responses = TTLCache(maxsize=settings.IDEMPOTENCY_MAX_KEYS, ttl=settings.IDEMPOTENCY_KEY_TTL)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, handler, fingerprint=None):
+        with self._lock:
+            stored = self.responses.get(key)
+            if stored is None:
+                done = self._in_flight.get(key)
+                owner = done is None
+                if owner:
+                    done = self._in_flight[key] = threading.Event()
+        if stored is not None:
+            return self._replay(stored, fingerprint)
+
+        if not owner:
+            done.wait(settings.IDEMPOTENCY_WAIT_TIMEOUT)
+            stored = self.responses.get(key)
+            if stored is None:
+                return Response({"error": "A request with this Idempotency-Key is still being processed."},
+                                status=status.HTTP_409_CONFLICT)
+            return self._replay(stored, fingerprint)
+
+        try:
+            response = handler()
+            # Server errors are not remembered so that the client can retry them.
+            if response.status_code < 500:
+                self.responses.set(key, (fingerprint, response.status_code, response.data))
+            return response
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+            done.set()
+
+    def _replay(self, stored, fingerprint):
+        stored_fingerprint, status_code, data = stored
+        if stored_fingerprint != fingerprint:
+            return Response({"error": "This Idempotency-Key was already used with a different request."},
+                            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+        response = Response(data, status=status_code)
+        response['Idempotent-Replayed'] = 'true'
+        return response
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        _store = IdempotencyStore()
+    return _store
+
+
+def request_fingerprint(request):
+    try:
+        body = request.body
+    except RawPostDataException:
+        # A multipart body has already been streamed into request.data.
+        body = repr(sorted(request.data.lists())).encode()
+    return hashlib.sha256(body).hexdigest()
+
+
+def idempotent(handler):
+    """Deduplicate retries of a view method that carry an Idempotency-Key.
+
+    Keys are scoped to the authenticated user, method and path, and a retry
+    must send the same body as the first request.
+    """
+    @wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        scope = (request.user.pk, request.method, request.path, key)
+        return get_store().run(scope, lambda: handler(self, request, *args, **kwargs),
+                               fingerprint=request_fingerprint(request))
+    return wrapper
@@ -0,0 +1,38 @@
+from decimal import Decimal
+
+from django.db.models import Sum
+
+from .models import LedgerEntry, BalanceCheckpoint
+
+
+def record_transfer(txn):
+    LedgerEntry.objects.bulk_create([
+        LedgerEntry(user_id=txn.sender_id, amount=-txn.amount, kind=LedgerEntry.TRANSFER, transaction=txn),
+        LedgerEntry(user_id=txn.recipient_id, amount=txn.amount, kind=LedgerEntry.TRANSFER, transaction=txn),
+    ])
+
+
+def record_top_up(top_up):
+    return LedgerEntry.objects.create(user_id=top_up.user_id, amount=top_up.amount, kind=LedgerEntry.TOP_UP,
+                                      top_up=top_up)
+
+
+def record_top_ups(top_ups):
+    return LedgerEntry.objects.bulk_create([
+        LedgerEntry(user_id=top_up.user_id, amount=top_up.amount, kind=LedgerEntry.TOP_UP, top_up=top_up)
+        for top_up in top_ups
+    ])
+
+
+def record_adjustment(user_id, delta):
+    if delta:
+        return LedgerEntry.objects.create(user_id=user_id, amount=delta, kind=LedgerEntry.ADJUSTMENT)
+
+
+def ledger_balance(user_id):
+    """The balance implied by the ledger: latest checkpoint plus the entries after it."""
+    checkpoint = BalanceCheckpoint.objects.filter(user_id=user_id).order_by('-entry_id') \
+        .values_list('entry_id', 'balance').first()
+    after, balance = checkpoint or (0, Decimal('0.00'))
+    delta = LedgerEntry.objects.filter(user_id=user_id, pk__gt=after).aggregate(total=Sum('amount'))['total']
+    return balance + (delta or 0)
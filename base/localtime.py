@@ -0,0 +1,8 @@
+"""The canteens' time zone.
+
+The database stores UTC (``TIME_ZONE``), but users read times, and vendors
+count sales days, in Manila time.
+"""
+import pytz
+
+LOCAL_TIMEZONE = pytz.timezone('Asia/Manila')
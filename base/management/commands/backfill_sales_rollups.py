@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from base.analytics import apply_deltas, order_deltas
+from base.models import Order, VendorSalesRollup
+
+
+def stream_order_batches(orders, batch_size):
+    last_pk = 0
+    while True:
+        batch = list(orders.filter(pk__gt=last_pk).order_by('pk')
+                     .only('vendor_id', 'food_id', 'created_at', 'quantity', 'total_price', 'is_paid')[:batch_size])
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            return
+        last_pk = batch[-1].pk
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the vendor sales rollups from existing orders, reading the Order table in batches. "
+            "Run it while no orders are being placed, or the rollups may count a new order twice.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--vendor', type=int, help="Only rebuild this vendor's rollups.")
+
+    def handle(self, *args, **options):
+        orders = Order.objects.exclude(vendor=None)
+        rollups = VendorSalesRollup.objects.all()
+        if options['vendor'] is not None:
+            orders = orders.filter(vendor_id=options['vendor'])
+            rollups = rollups.filter(vendor_id=options['vendor'])
+
+        rollups.delete()
+        total = 0
+        for batch in stream_order_batches(orders, options['batch_size']):
+            # One transaction per batch keeps writers waiting briefly, not for the whole rebuild.
+            with transaction.atomic():
+                apply_deltas(order_deltas(batch))
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f"Rolled up {total} orders into {rollups.count()} rows."))
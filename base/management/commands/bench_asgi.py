@@ -0,0 +1,103 @@
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework_simplejwt.tokens import AccessToken
+
+from base import async_views, views
+from base.models import CustomUser, Canteen, FoodCategory, Food, Order
+
+from ._bench import scratch_database
+
+ENDPOINTS = {
+    'canteens': (views.CanteenListView, async_views.CanteenListView),
+    'featured-foods': (views.FeaturedFoodListView, async_views.FeaturedFoodListView),
+    'balance': (views.UserBalanceView, async_views.UserBalanceView),
+    'orders': (views.OrderListView, async_views.OrderListView),
+}
+
+# Both stacks side by side; the command points ROOT_URLCONF at this module.
+urlpatterns = [
+    path(f'{stack}/{name}/', view.as_view())
+    for name, pair in ENDPOINTS.items()
+    for stack, view in zip(('wsgi', 'asgi'), pair)
+]
+
+
+class Command(BaseCommand):
+    help = ("Compare how many concurrent connections the read endpoints sustain under a thread-pool "
+            "WSGI worker versus a single ASGI event loop (in process, no network).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--connections', type=int, default=200, help="Concurrent client connections.")
+        parser.add_argument('--rounds', type=int, default=5, help="Requests sent by each connection.")
+        parser.add_argument('--threads', type=int, default=8, help="WSGI worker threads.")
+
+    def handle(self, *args, **options):
+        with scratch_database(), override_settings(ROOT_URLCONF=__name__):
+            token = self.seed()
+            for name in ENDPOINTS:
+                cache.clear()
+                wsgi = asyncio.run(self.run_wsgi(f'/wsgi/{name}/', token, options))
+                cache.clear()
+                asgi = asyncio.run(self.run_asgi(f'/asgi/{name}/', token, options))
+                for stack, (elapsed, latencies) in (('WSGI', wsgi), ('ASGI', asgi)):
+                    self.report(name, stack, elapsed, latencies, options)
+
+    def seed(self):
+        vendor = CustomUser.objects.create_user(phone_number='09170000001', email='vendor@example.com', is_staff=True)
+        buyer = CustomUser.objects.create_user(phone_number='09170000002', email='buyer@example.com',
+                                               balance=Decimal('500.00'))
+        for c in range(3):
+            category = FoodCategory.objects.create(name=f'Category {c}', canteen=Canteen.objects.create(name=f'Canteen {c}'))
+            for f in range(10):
+                food = Food.objects.create(name=f'Food {c}-{f}', price=Decimal('50.00'), category=category,
+                                           vendor=vendor, is_approved=True)
+                Order.objects.create(user=buyer, food=food, quantity=1, total_price=food.price, vendor=vendor)
+        return f'Bearer {AccessToken.for_user(buyer)}'
+
+    async def run_wsgi(self, url, token, options):
+        client = Client(HTTP_AUTHORIZATION=token)
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            result = await self.drive(lambda: loop.run_in_executor(pool, client.get, url), options)
+            # Close each worker thread's database connection.
+            barrier = threading.Barrier(options['threads'])
+            for _ in range(options['threads']):
+                pool.submit(lambda: (barrier.wait(), connection.close()))
+        return result
+
+    async def run_asgi(self, url, token, options):
+        client = AsyncClient()
+        return await self.drive(lambda: client.get(url, AUTHORIZATION=token), options)
+
+    async def drive(self, send, options):
+        latencies = []
+
+        async def connection_loop():
+            for _ in range(options['rounds']):
+                started = time.perf_counter()
+                response = await send()
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, response.status_code
+
+        started = time.perf_counter()
+        await asyncio.gather(*(connection_loop() for _ in range(options['connections'])))
+        return time.perf_counter() - started, latencies
+
+    def report(self, name, stack, elapsed, latencies, options):
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        self.stdout.write(
+            f"{name:15} {stack}  {options['connections']} connections: {len(latencies) / elapsed:8.1f} req/s, "
+            f"p50 {statistics.median(latencies) * 1000:7.1f} ms, p99 {p99 * 1000:7.1f} ms"
+        )
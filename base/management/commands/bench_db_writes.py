@@ -0,0 +1,98 @@
+import copy
+import threading
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections
+
+from base.models import CustomUser, Canteen, FoodCategory, Food, Order
+from base.payments import transfer_funds, TransferError
+
+from ._bench import scratch_database
+
+
+def _reset_default_connection():
+    try:
+        del connections['default']
+    except AttributeError:
+        pass
+
+
+@contextmanager
+def database_profile(name):
+    """Point the default alias at another entry of settings.DATABASE_PROFILES."""
+    connections.close_all()
+    original = connections.settings['default']
+    profile = copy.deepcopy(settings.DATABASE_PROFILES[name])
+    connections.settings['default'] = connections.configure_settings({'default': profile})['default']
+    _reset_default_connection()
+    try:
+        yield
+    finally:
+        connections.close_all()
+        connections.settings['default'] = original
+        _reset_default_connection()
+
+
+class Command(BaseCommand):
+    help = "Compare concurrent write throughput (transfers and order inserts) across database profiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', default=['sqlite-basic', 'sqlite'])
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=200, help="Writes attempted per thread.")
+
+    def handle(self, *args, **options):
+        for name in options['profiles']:
+            if name not in settings.DATABASE_PROFILES:
+                raise CommandError(f"Unknown database profile {name!r}.")
+            with database_profile(name), scratch_database():
+                ok, locked, elapsed = self.run(options)
+            self.stdout.write(
+                f"{name:14} {ok:6} writes in {elapsed:6.2f}s = {ok / elapsed:8.1f} writes/s, "
+                f"{locked} 'database is locked' errors"
+            )
+
+    def run(self, options):
+        users = CustomUser.objects.bulk_create([
+            CustomUser(phone_number=f'0917{i:07d}', first_name='Bench', last_name=str(i), balance=Decimal('1000000'))
+            for i in range(options['threads'] * 2)
+        ])
+        category = FoodCategory.objects.create(name='Bench', canteen=Canteen.objects.create(name='Bench'))
+        food = Food.objects.create(name='Bench meal', price=Decimal('50.00'), category=category)
+        user_ids = [user.pk for user in users]
+
+        counts = {'ok': 0, 'locked': 0}
+        lock = threading.Lock()
+
+        def worker(index):
+            ok = locked = 0
+            me, other = user_ids[index * 2], user_ids[index * 2 + 1]
+            try:
+                for i in range(options['writes']):
+                    try:
+                        if i % 2:
+                            transfer_funds(me, other, Decimal('1.00'))
+                        else:
+                            Order.objects.create(user_id=me, food=food, quantity=1, total_price=food.price)
+                        ok += 1
+                    except OperationalError:
+                        locked += 1
+                    except TransferError:
+                        pass
+            finally:
+                connection.close()
+                with lock:
+                    counts['ok'] += ok
+                    counts['locked'] += locked
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return counts['ok'], counts['locked'], time.perf_counter() - started
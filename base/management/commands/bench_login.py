@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from base.accounts import authenticate_user
+from base.models import CustomUser
+
+from ._bench import scratch_database
+
+HASHERS = {
+    'pbkdf2_sha256': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'scrypt': 'django.contrib.auth.hashers.ScryptPasswordHasher',
+}
+
+
+class Command(BaseCommand):
+    help = "Measure single-threaded logins per second (one core) for each login path and hasher."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            def legacy(password):
+                # The old email login: authenticate() and then check_password() again.
+                user = authenticate(email='bench@example.com', password=password)
+                return user and user.check_password(password)
+
+            def single(password):
+                return authenticate_user(password, email='bench@example.com')
+
+            for name, hasher in HASHERS.items():
+                others = [h for h in settings.PASSWORD_HASHERS if h != hasher]
+                # With the hasher under test preferred, no login triggers a rehash.
+                with override_settings(PASSWORD_HASHERS=[hasher] + others):
+                    CustomUser.objects.all().delete()
+                    CustomUser.objects.create_user(email='bench@example.com', password='secret',
+                                                   first_name='Bench', last_name='User')
+                    for label, login in (('authenticate + check_password', legacy),
+                                         ('accounts.authenticate_user', single)):
+                        started = time.perf_counter()
+                        for _ in range(options['logins']):
+                            if not login('secret'):
+                                raise RuntimeError(f"{label} rejected a valid password")
+                        elapsed = time.perf_counter() - started
+                        self.stdout.write(f"{name:14} {label:30} {options['logins'] / elapsed:8.1f} logins/s per core")
@@ -0,0 +1,74 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from base.middleware import brotli
+from base.models import CustomUser, Canteen, FoodCategory, Food, Order
+from base.renderers import FastJSONRenderer
+
+from ._bench import scratch_database
+
+ENDPOINTS = ('featured-food-list', 'order-list')
+
+
+class Command(BaseCommand):
+    help = ("Report JSON render time (DRF's renderer against FastJSONRenderer) and bytes on the wire per "
+            "Accept-Encoding for featured-foods/ and orders/.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--foods', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            client = APIClient()
+            client.force_authenticate(self.seed(options))
+            encodings = ['identity', 'gzip'] + (['br'] if brotli is not None else [])
+
+            for name in ENDPOINTS:
+                cache.clear()
+                url = reverse(name)
+                data = client.get(url).data
+                timings = {
+                    renderer.__class__.__name__: self.time(renderer, data, options)
+                    for renderer in (JSONRenderer(), FastJSONRenderer())
+                }
+                sizes = {
+                    encoding: len(client.get(url, HTTP_ACCEPT_ENCODING=encoding).content) for encoding in encodings
+                }
+                self.stdout.write(
+                    f"{url:17} render " + ', '.join(f"{k} {v * 1000:.2f} ms" for k, v in timings.items())
+                    + " | bytes " + ', '.join(f"{k} {v}" for k, v in sizes.items())
+                )
+
+    def seed(self, options):
+        buyer = CustomUser.objects.create_user(phone_number='09170000001', email='buyer@example.com')
+        vendor = CustomUser.objects.create_user(phone_number='09170000002', email='vendor@example.com', is_staff=True)
+        canteen = Canteen.objects.create(name='Main Canteen', description='Ground floor, beside the library')
+        categories = [FoodCategory.objects.create(name=f'Category {i}', canteen=canteen) for i in range(10)]
+        foods = [
+            Food.objects.create(name=f'Meal {i}', description='Rice, viand and a drink', price=Decimal('55.00'),
+                                category=categories[i % 10], vendor=vendor, is_approved=True)
+            for i in range(options['foods'])
+        ]
+        Order.objects.bulk_create([
+            Order(user=buyer, food=foods[i % len(foods)], quantity=1, total_price=Decimal('55.00'), vendor=vendor,
+                  is_paid=True)
+            for i in range(options['orders'])
+        ])
+        return buyer
+
+    def time(self, renderer, data, options):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            renderer.render(data)
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings)
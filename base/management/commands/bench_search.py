@@ -0,0 +1,77 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from base.models import CustomUser, Canteen, FoodCategory, Food
+from base.search import rebuild_index, search_food_ids
+
+from ._bench import scratch_database
+
+DISHES = ['adobo', 'sinigang', 'kare-kare', 'lechon', 'pancit', 'lumpia', 'tapsilog', 'longsilog', 'bistek',
+          'menudo', 'afritada', 'caldereta', 'tinola', 'bulalo', 'sisig', 'turon', 'halo-halo', 'bibingka']
+STYLES = ['chicken', 'pork', 'beef', 'spicy', 'garlic', 'classic', 'special', 'mini', 'family', 'vegan']
+WORDS = ['rice', 'egg', 'soup', 'sweet', 'sour', 'crispy', 'grilled', 'steamed', 'fried', 'sauce', 'fresh']
+QUERIES = ['adobo', 'chicken adobo', 'sisig rice', 'ado', 'crispy pork', 'halo', 'special bulalo soup',
+           'canteen 7', 'zzz', 'egg']
+
+
+class Command(BaseCommand):
+    help = "Measure menu search latency over a synthetic menu (100k foods by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--foods', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=50, help="Runs of each query.")
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            user = self.seed(options['foods'])
+
+            started = time.perf_counter()
+            with transaction.atomic():
+                indexed = rebuild_index()
+            self.stdout.write(f"rebuild_search_index: {indexed} foods in {time.perf_counter() - started:.2f} s")
+
+            client = APIClient()
+            client.force_authenticate(user)
+            for query in QUERIES:
+                ids = self.time(lambda: search_food_ids(query, 0, 21), options)
+                view = self.time(lambda: client.get(reverse('menu-search'), {'q': query}), options)
+                hits = len(search_food_ids(query, 0, 1000))
+                self.stdout.write(
+                    f"{query!r:24} {hits:>5}{'+' if hits == 1000 else ' '} hits  "
+                    f"index p50 {ids[0]:6.2f} ms p95 {ids[1]:6.2f} ms  "
+                    f"endpoint p50 {view[0]:6.2f} ms p95 {view[1]:6.2f} ms"
+                )
+
+    def seed(self, count):
+        rng = random.Random(0)
+        canteens = Canteen.objects.bulk_create([Canteen(name=f'Canteen {i}') for i in range(20)])
+        categories = FoodCategory.objects.bulk_create([
+            FoodCategory(name=f'{rng.choice(WORDS).title()} Meals {i}', canteen=canteens[i % 20]) for i in range(200)
+        ])
+        batch = []
+        for i in range(count):
+            name = f'{rng.choice(STYLES).title()} {rng.choice(DISHES).title()} {i}'
+            description = ' '.join(rng.sample(WORDS, 4))
+            batch.append(Food(name=name, description=description, price=Decimal('55.00'),
+                              category=categories[i % 200]))
+            if len(batch) == 5000:
+                Food.objects.bulk_create(batch)
+                batch = []
+        Food.objects.bulk_create(batch)
+        return CustomUser.objects.create_user(phone_number='09170000001', email='bench@example.com')
+
+    def time(self, run, options):
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
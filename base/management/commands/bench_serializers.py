@@ -0,0 +1,75 @@
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from base.models import CustomUser, Canteen, FoodCategory, Food, Order, Transaction
+from base.projections import TRANSACTION_COLUMNS, order_rows, transaction_row
+from base.serializers import OrderSerializer, TransactionSerializer
+
+from ._bench import scratch_database
+
+
+class Command(BaseCommand):
+    help = ("Time the ModelSerializer path against the plain-value projections for transactions/ and "
+            "orders/ pages (query, row building and JSON rendering), and check the bodies match.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500, help="Rows per page.")
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            buyer, vendor = self.seed(options['rows'])
+            orders = Order.objects.filter(user=buyer).order_by('-created_at') \
+                .select_related('user', 'vendor', 'food__category__canteen', 'food__vendor')
+            history = Transaction.objects.filter(sender=buyer).order_by('-date', '-pk')
+
+            cases = {
+                'orders': (
+                    lambda: OrderSerializer(orders, many=True).data,
+                    lambda: order_rows(orders),
+                ),
+                'transactions': (
+                    lambda: TransactionSerializer(
+                        history.select_related('sender', 'recipient')
+                        .only('amount', 'date', 'sender__email', 'recipient__email'), many=True).data,
+                    lambda: [transaction_row(row) for row in history.values(*TRANSACTION_COLUMNS)],
+                ),
+            }
+            for name, (serializer, projection) in cases.items():
+                (slow, expected), (fast, body) = self.time(serializer, options), self.time(projection, options)
+                if body != expected:
+                    raise CommandError(f"{name}: projection output differs from the serializer output.")
+                self.stdout.write(
+                    f"{name:13} {options['rows']} rows: serializer {slow * 1000:7.2f} ms, "
+                    f"projection {fast * 1000:7.2f} ms ({slow / fast:4.1f}x)"
+                )
+
+    def seed(self, rows):
+        buyer = CustomUser.objects.create_user(phone_number='09170000001', email='buyer@example.com',
+                                               balance=Decimal('1000000.00'))
+        vendor = CustomUser.objects.create_user(phone_number='09170000002', email='vendor@example.com', is_staff=True)
+        category = FoodCategory.objects.create(name='Rice Meals', canteen=Canteen.objects.create(name='Main Canteen'))
+        foods = [Food.objects.create(name=f'Meal {i}', price=Decimal('55.00'), category=category, vendor=vendor)
+                 for i in range(10)]
+        Order.objects.bulk_create([
+            Order(user=buyer, food=foods[i % 10], quantity=1, total_price=Decimal('55.00'), vendor=vendor,
+                  is_paid=True)
+            for i in range(rows)
+        ])
+        Transaction.objects.bulk_create([
+            Transaction(sender=buyer, recipient=vendor, amount=Decimal(i) / 100) for i in range(1, rows + 1)
+        ])
+        return buyer, vendor
+
+    def time(self, build, options):
+        renderer = JSONRenderer()
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            body = renderer.render(build())
+            timings.append(time.perf_counter() - started)
+        return statistics.median(timings), body
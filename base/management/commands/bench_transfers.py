@@ -0,0 +1,87 @@
+import random
+import threading
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Sum
+
+from base.models import CustomUser, Transaction
+from base.payments import transfer_funds, TransferError
+
+from ._bench import scratch_database
+
+
+class Command(BaseCommand):
+    help = "Stress test transfer_funds from several threads and check that no money is lost."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--transfers', type=int, default=250, help="Transfers attempted per thread.")
+        parser.add_argument('--balance', type=Decimal, default=Decimal('100.00'))
+
+    def handle(self, *args, **options):
+        with scratch_database():
+            self.run(options)
+
+    def run(self, options):
+        CustomUser.objects.bulk_create([
+            CustomUser(phone_number=f'0917{i:07d}', first_name='Bench', last_name=str(i), balance=options['balance'])
+            for i in range(options['users'])
+        ])
+        user_ids = list(CustomUser.objects.values_list('pk', flat=True))
+        opening = {pk: options['balance'] for pk in user_ids}
+
+        counts = {'ok': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            local = {'ok': 0, 'rejected': 0, 'errors': 0}
+            try:
+                for _ in range(options['transfers']):
+                    sender_id, recipient_id = rng.sample(user_ids, 2)
+                    amount = Decimal(rng.randint(1, 5000)) / 100
+                    try:
+                        transfer_funds(sender_id, recipient_id, amount)
+                        local['ok'] += 1
+                    except TransferError:
+                        local['rejected'] += 1
+                    except Exception:
+                        local['errors'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        counts[key] += value
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{counts['ok']} transfers, {counts['rejected']} rejected, {counts['errors']} errors "
+            f"in {elapsed:.2f}s across {options['threads']} threads: {counts['ok'] / elapsed:.1f} transfers/s"
+        )
+
+        self.check_conservation(opening)
+
+    def check_conservation(self, opening):
+        expected = dict(opening)
+        for sender_id, recipient_id, amount in Transaction.objects.values_list('sender_id', 'recipient_id', 'amount'):
+            expected[sender_id] -= amount
+            expected[recipient_id] += amount
+
+        balances = dict(CustomUser.objects.values_list('pk', 'balance'))
+        total = CustomUser.objects.aggregate(total=Sum('balance'))['total']
+        mismatched = [pk for pk, balance in balances.items() if balance != expected[pk] or balance < 0]
+
+        if total != sum(opening.values()) or mismatched:
+            raise CommandError(f"Money was lost: total={total}, mismatched users={mismatched}")
+        self.stdout.write(self.style.SUCCESS(f"Total balance conserved at {total:.2f}; every balance matches its transactions."))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from base.menu_snapshot import rebuild
+from base.models import Canteen, MenuSnapshot
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the prebuilt canteen menus served by canteens/<id>/menu/, e.g. after bulk menu changes "
+            "that bypass signals. Snapshots of deleted canteens are dropped.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('canteen_ids', nargs='*', type=int, help="Only these canteens (default: all).")
+
+    def handle(self, *args, **options):
+        canteen_ids = options['canteen_ids'] or list(Canteen.objects.order_by('pk').values_list('pk', flat=True))
+        if not options['canteen_ids']:
+            stale = MenuSnapshot.objects.exclude(pk__in=canteen_ids).values_list('pk', flat=True)
+            canteen_ids += list(stale)
+        for canteen_id in canteen_ids:
+            rebuild(canteen_id)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {len(canteen_ids)} menu snapshots."))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from base.search import rebuild_index, uses_fts
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the menu search index from the Food, FoodCategory and Canteen tables, e.g. after "
+            "bulk imports or QuerySet.update() calls that bypass the signals keeping it in sync.")
+
+    def handle(self, *args, **options):
+        if not uses_fts():
+            self.stdout.write("This database searches without an index; nothing to rebuild.")
+            return
+        with transaction.atomic():
+            count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} foods."))
@@ -0,0 +1,93 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+
+from base.models import CustomUser, LedgerEntry, BalanceCheckpoint
+
+
+def stream_users(chunk_size):
+    last_pk = 0
+    while True:
+        rows = list(CustomUser.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'balance')[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last_pk = rows[-1][0]
+
+
+def stream_ledger_totals(chunk_size):
+    """Yield ``(user_id, total, last_entry_id)`` in user order, reading the
+    ledger in keyset chunks over the (user, id) index."""
+    last_user, last_id = 0, 0
+    current, total, current_last = None, Decimal('0.00'), None
+    while True:
+        rows = list(
+            LedgerEntry.objects.filter(Q(user_id__gt=last_user) | Q(user_id=last_user, pk__gt=last_id))
+            .order_by('user_id', 'pk').values_list('user_id', 'pk', 'amount')[:chunk_size]
+        )
+        for user_id, pk, amount in rows:
+            if user_id != current:
+                if current is not None:
+                    yield current, total, current_last
+                current, total = user_id, Decimal('0.00')
+            total += amount
+            current_last = pk
+        if len(rows) < chunk_size:
+            break
+        last_user, last_id = rows[-1][0], rows[-1][1]
+    if current is not None:
+        yield current, total, current_last
+
+
+class Command(BaseCommand):
+    help = ("Stream the ledger and every user's balance in chunks and report users whose balance does not "
+            "match the sum of their ledger entries. Memory use does not grow with the ledger.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--checkpoint', action='store_true',
+                            help="Write a balance checkpoint for every user that reconciles.")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        totals = stream_ledger_totals(chunk_size)
+        pending = next(totals, None)
+        checkpoints = []
+        checked = mismatched = 0
+
+        for user_id, balance in stream_users(chunk_size):
+            checked += 1
+            expected, last_entry_id = Decimal('0.00'), None
+            if pending is not None and pending[0] == user_id:
+                _, expected, last_entry_id = pending
+                pending = next(totals, None)
+
+            if balance != expected:
+                # Balances keep moving while we scan; look again in one snapshot
+                # before calling it a mismatch.
+                balance, expected, last_entry_id = self.recheck(user_id)
+                if balance != expected:
+                    mismatched += 1
+                    self.stdout.write(f"user {user_id}: balance {balance} != ledger {expected}")
+                    continue
+
+            if options['checkpoint'] and last_entry_id is not None:
+                checkpoints.append(BalanceCheckpoint(user_id=user_id, entry_id=last_entry_id, balance=expected))
+                if len(checkpoints) >= chunk_size:
+                    BalanceCheckpoint.objects.bulk_create(checkpoints)
+                    checkpoints = []
+
+        BalanceCheckpoint.objects.bulk_create(checkpoints)
+
+        summary = f"Checked {checked} users, {mismatched} mismatched."
+        if mismatched:
+            raise CommandError(summary)
+        self.stdout.write(self.style.SUCCESS(summary))
+
+    def recheck(self, user_id):
+        with transaction.atomic():
+            balance = CustomUser.objects.values_list('balance', flat=True).get(pk=user_id)
+            ledger = LedgerEntry.objects.filter(user_id=user_id).aggregate(total=Sum('amount'), last=Max('pk'))
+        return balance, ledger['total'] or Decimal('0.00'), ledger['last']
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from base.featured import find_drift, repair
+
+
+class Command(BaseCommand):
+    help = ("Make FeaturedFood match Food.is_approved again after changes that bypassed Food.save(): "
+            "feature every approved food and unfeature every food that is not approved.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the drift.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            missing, stale = find_drift()
+            self.stdout.write(f"{missing.count()} approved foods are not featured, "
+                              f"{stale.count()} featured foods are not approved.")
+            return
+        added, removed = repair(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Featured {added} foods, unfeatured {removed}."))
@@ -0,0 +1,86 @@
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import Canteen, FoodCategory, Food, FeaturedFood
+
+MENU_VERSION_KEY = 'menu:version'
+MENU_MODELS = (Canteen, FoodCategory, Food, FeaturedFood)
+
+
+def get_menu_version():
+    version = cache.get(MENU_VERSION_KEY)
+    if version is None:
+        cache.add(MENU_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = cache.get(MENU_VERSION_KEY)
+    return version
+
+
+async def aget_menu_version():
+    version = await cache.aget(MENU_VERSION_KEY)
+    if version is None:
+        await cache.aadd(MENU_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+        version = await cache.aget(MENU_VERSION_KEY)
+    return version
+
+
+def bump_menu_version(**kwargs):
+    cache.set(MENU_VERSION_KEY, uuid.uuid4().hex, timeout=None)
+
+
+def connect_signals():
+    for model in MENU_MODELS:
+        post_save.connect(bump_menu_version, sender=model, dispatch_uid=f'menu-cache-save-{model.__name__}')
+        post_delete.connect(bump_menu_version, sender=model, dispatch_uid=f'menu-cache-delete-{model.__name__}')
+
+
+def menu_etag(version):
+    return f'"menu-{version}"'
+
+
+def etag_matches(request, etag):
+    # If-None-Match uses the weak comparison, so the W/ prefix added to
+    # compressed responses does not matter.
+    candidates = parse_etags(request.headers.get('If-None-Match', ''))
+    return '*' in candidates or etag in (c.removeprefix('W/') for c in candidates)
+
+
+def menu_cache_key(version, request):
+    return f'menu:{version}:{request.get_full_path()}'
+
+
+def set_menu_headers(response, etag):
+    response['ETag'] = etag
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+class MenuCacheMixin:
+    """Serve a list view from the cache under the current menu version.
+
+    Every save or delete of a menu model moves the version, which both
+    invalidates the stored responses and changes the ETag, so a client that
+    sends the ETag back gets a 304 without the menu being read at all.
+    """
+
+    def list(self, request, *args, **kwargs):
+        version = get_menu_version()
+        etag = menu_etag(version)
+
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            key = menu_cache_key(version, request)
+            data = cache.get(key)
+            if data is None:
+                data = super().list(request, *args, **kwargs).data
+                cache.set(key, data, timeout=settings.MENU_CACHE_TIMEOUT)
+            response = Response(data)
+
+        return set_menu_headers(response, etag)
@@ -0,0 +1,160 @@
+"""Prebuilt whole-canteen menus.
+
+``canteens/<id>/menu/`` returns a canteen with its categories and their foods
+in one document. The document is built ahead of time, gzip-compressed, and
+stored in MenuSnapshot. It is also cached under ``menu-snapshot:<id>``, so a
+request costs one cache read. Only a cold cache falls back to reading the
+snapshot row.
+
+Saves and deletes of Canteen, FoodCategory and Food mark the affected
+canteens as dirty. Once the transaction commits, only those canteens are
+rebuilt, each of them once however many rows changed. The menus embed the
+vendors' contact details, so a vendor's new email or phone number marks the
+canteens that sell their food as dirty too. Changes that bypass
+signals (``QuerySet.update()``, ``bulk_create()``) need
+``rebuild_menu_snapshots``.
+"""
+import gzip
+import hashlib
+import threading
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from rest_framework import serializers
+
+from .menu_cache import bump_menu_version
+from .models import Canteen, CustomUser, FoodCategory, Food, MenuSnapshot
+from .renderers import render_json
+
+_money = serializers.DecimalField(max_digits=10, decimal_places=2)
+_dirty = threading.local()
+
+
+def snapshot_cache_key(canteen_id):
+    return f'menu-snapshot:{canteen_id}'
+
+
+def build_menu(canteen_id):
+    """The menu document for a canteen, or None if it does not exist."""
+    canteen = Canteen.objects.filter(pk=canteen_id).values('id', 'name', 'description').first()
+    if canteen is None:
+        return None
+    categories = {
+        pk: {'id': pk, 'name': name, 'foods': []}
+        for pk, name in FoodCategory.objects.filter(canteen_id=canteen_id).order_by('pk').values_list('pk', 'name')
+    }
+    foods = Food.objects.filter(category__canteen_id=canteen_id).order_by('pk').values_list(
+        'pk', 'category_id', 'name', 'description', 'price', 'vendor_id', 'vendor__email', 'vendor__phone_number',
+    )
+    for pk, category_id, name, description, price, vendor_id, vendor_email, vendor_phone in foods:
+        categories[category_id]['foods'].append({
+            'id': pk,
+            'name': name,
+            'description': description,
+            'price': _money.to_representation(price),
+            'vendor': (vendor_email or vendor_phone) if vendor_id is not None else None,
+            'vendor_phone_number': vendor_phone,
+        })
+    canteen['categories'] = list(categories.values())
+    return canteen
+
+
+def rebuild(canteen_id):
+    """Rebuild one canteen's snapshot and refresh the cache. Returns the cached entry."""
+    menu = build_menu(canteen_id)
+    if menu is None:
+        MenuSnapshot.objects.filter(pk=canteen_id).delete()
+        cache.delete(snapshot_cache_key(canteen_id))
+        return None
+
+    body = render_json(menu)
+    etag = f'"menu-{canteen_id}-{hashlib.sha1(body).hexdigest()[:20]}"'
+    entry = (etag, gzip.compress(body, compresslevel=9, mtime=0))
+    MenuSnapshot.objects.update_or_create(pk=canteen_id, defaults={'etag': entry[0], 'body': entry[1]})
+    cache.set(snapshot_cache_key(canteen_id), entry, timeout=None)
+    return entry
+
+
+def get_snapshot(canteen_id):
+    """``(etag, gzip_body)`` for a canteen, or None if it does not exist."""
+    entry = cache.get(snapshot_cache_key(canteen_id))
+    if entry is None:
+        row = MenuSnapshot.objects.filter(pk=canteen_id).values_list('etag', 'body').first()
+        if row is None:
+            return rebuild(canteen_id)
+        entry = (row[0], bytes(row[1]))
+        cache.set(snapshot_cache_key(canteen_id), entry, timeout=None)
+    return entry
+
+
+def _flush():
+    pending = getattr(_dirty, 'canteens', None)
+    _dirty.canteens = set()
+    for canteen_id in pending or ():
+        rebuild(canteen_id)
+
+
+def mark_dirty(*canteen_ids):
+    # Per thread, because each thread commits its own transactions. After a
+    # rollback the ids stay marked and are rebuilt on the next commit.
+    pending = getattr(_dirty, 'canteens', None)
+    if pending is None:
+        pending = _dirty.canteens = set()
+    pending.update(canteen_id for canteen_id in canteen_ids if canteen_id is not None)
+    transaction.on_commit(_flush)
+
+
+def _remember_canteen(sender, instance, raw=False, **kwargs):
+    # Moving a category or food to another canteen changes two menus.
+    if instance.pk is None or raw:
+        instance._menu_canteen_id = None
+    elif sender is Food:
+        instance._menu_canteen_id = Food.objects.filter(pk=instance.pk) \
+            .values_list('category__canteen_id', flat=True).first()
+    else:
+        instance._menu_canteen_id = FoodCategory.objects.filter(pk=instance.pk) \
+            .values_list('canteen_id', flat=True).first()
+
+
+def _food_changed(sender, instance, **kwargs):
+    canteen_id = FoodCategory.objects.filter(pk=instance.category_id).values_list('canteen_id', flat=True).first()
+    mark_dirty(canteen_id, getattr(instance, '_menu_canteen_id', None))
+
+
+def _category_changed(sender, instance, **kwargs):
+    mark_dirty(instance.canteen_id, getattr(instance, '_menu_canteen_id', None))
+
+
+def _canteen_changed(sender, instance, **kwargs):
+    mark_dirty(instance.pk)
+
+
+def _remember_contact(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Logins save last_login only; skip the lookup when no contact field is written.
+    if instance.pk is None or raw or (update_fields is not None and not {'email', 'phone_number'} & set(update_fields)):
+        instance._menu_contact = None
+    else:
+        instance._menu_contact = CustomUser.objects.filter(pk=instance.pk) \
+            .values_list('email', 'phone_number').first()
+
+
+def _vendor_changed(sender, instance, **kwargs):
+    contact = getattr(instance, '_menu_contact', None)
+    if contact is None or contact == (instance.email, instance.phone_number):
+        return
+    canteen_ids = set(Food.objects.filter(vendor=instance).values_list('category__canteen_id', flat=True))
+    if canteen_ids:
+        mark_dirty(*canteen_ids)
+        bump_menu_version()
+
+
+def connect_signals():
+    pre_save.connect(_remember_contact, sender=CustomUser, dispatch_uid='menu-snapshot-pre-save-vendor')
+    post_save.connect(_vendor_changed, sender=CustomUser, dispatch_uid='menu-snapshot-save-vendor')
+    for model, handler in ((Food, _food_changed), (FoodCategory, _category_changed), (Canteen, _canteen_changed)):
+        name = model.__name__
+        if model is not Canteen:
+            pre_save.connect(_remember_canteen, sender=model, dispatch_uid=f'menu-snapshot-pre-save-{name}')
+        post_save.connect(handler, sender=model, dispatch_uid=f'menu-snapshot-save-{name}')
+        post_delete.connect(handler, sender=model, dispatch_uid=f'menu-snapshot-delete-{name}')
@@ -0,0 +1,233 @@
+"""Per-endpoint request metrics in Prometheus text format.
+
+``MetricsMiddleware`` records, for every request, its latency and response
+size under the labels route (the URL name), method and status. For a sampled
+fraction of requests (``METRICS_SAMPLE_RATE``) it also counts the database
+queries and their time. Every connection carries one execute wrapper that
+times a query only when the current request is sampled; the request's counter
+lives in a context variable, which asgiref copies into the threads that run
+the async ORM, so async views are counted too. For an unsampled request a
+query costs one context variable lookup.
+
+Every series is a fixed set of histogram buckets, and at most
+``METRICS_MAX_SERIES`` label combinations are kept; requests for further
+combinations are only counted in ``juanbytes_http_series_dropped_total``.
+Memory therefore stays bounded whatever the traffic. The counters are per
+process and start from zero when a worker restarts, as Prometheus expects.
+"""
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+    def lines(self, name, labels):
+        cumulative = 0
+        for bound, count in zip(self.bounds + ('+Inf',), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum}'
+        yield f'{name}_count{{{labels}}} {cumulative}'
+
+
+class Series:
+    __slots__ = ('latency', 'size', 'queries', 'query_seconds')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.query_seconds = 0.0
+
+
+class Registry:
+    def __init__(self, max_series):
+        self.max_series = max_series
+        self.series = {}
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def record(self, key, latency, size, queries=None, query_seconds=0.0):
+        with self._lock:
+            series = self.series.get(key)
+            if series is None:
+                if len(self.series) >= self.max_series:
+                    self.dropped += 1
+                    return
+                series = self.series[key] = Series()
+            series.latency.observe(latency)
+            if size is not None:
+                series.size.observe(size)
+            if queries is not None:
+                series.queries.observe(queries)
+                series.query_seconds += query_seconds
+
+    def clear(self):
+        with self._lock:
+            self.series.clear()
+            self.dropped = 0
+
+    def render(self):
+        """The metrics in Prometheus text exposition format 0.0.4."""
+        with self._lock:
+            items = sorted(self.series.items())
+            snapshot = [(key, _copy(series)) for key, series in items]
+            dropped = self.dropped
+
+        out = []
+        for name, kind, help_text, attr in (
+            ('juanbytes_http_request_duration_seconds', 'histogram', "Request latency.", 'latency'),
+            ('juanbytes_http_response_size_bytes', 'histogram', "Response body size on the wire.", 'size'),
+            ('juanbytes_http_request_db_queries', 'histogram', "Database queries per sampled request.", 'queries'),
+        ):
+            out.append(f'# HELP {name} {help_text}')
+            out.append(f'# TYPE {name} {kind}')
+            for key, series in snapshot:
+                out.extend(getattr(series, attr).lines(name, _labels(key)))
+
+        name = 'juanbytes_http_request_db_seconds_total'
+        out.append(f'# HELP {name} Time spent in database queries by sampled requests.')
+        out.append(f'# TYPE {name} counter')
+        out.extend(f'{name}{{{_labels(key)}}} {series.query_seconds}' for key, series in snapshot)
+
+        name = 'juanbytes_http_series_dropped_total'
+        out.append(f'# HELP {name} Requests not recorded because METRICS_MAX_SERIES was reached.')
+        out.append(f'# TYPE {name} counter')
+        out.append(f'{name} {dropped}')
+        return '\n'.join(out) + '\n'
+
+
+def _copy(series):
+    copy = Series()
+    for attr in ('latency', 'size', 'queries'):
+        source, target = getattr(series, attr), getattr(copy, attr)
+        target.counts, target.sum = list(source.counts), source.sum
+    copy.query_seconds = series.query_seconds
+    return copy
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(key):
+    route, method, status = key
+    return f'route="{_escape(route)}",method="{_escape(method)}",status="{status}"'
+
+
+registry = Registry(settings.METRICS_MAX_SERIES)
+
+
+class QueryCounter:
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+
+_counter = ContextVar('metrics_query_counter', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = _counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.count += 1
+        counter.seconds += time.perf_counter() - started
+
+
+def _install(connection, **kwargs):
+    # Wrappers live on the connection object, which outlives reconnects. It
+    # goes first because connection.execute_wrapper() blocks pop the last one.
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, count_queries)
+
+
+def connect_signals():
+    connection_created.connect(_install, dispatch_uid='metrics-count-queries')
+    for connection in connections.all(initialized_only=True):
+        _install(connection)
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route or 'unnamed'
+
+
+class MetricsMiddleware:
+    """Record latency, response size and (sampled) query metrics per route.
+
+    Placed first so the latency covers the other middleware and the size is
+    what compression left. Works in both stacks, like CompressionMiddleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.METRICS_ENABLED:
+            return self.get_response(request)
+        counter, token, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            _counter.reset(token)
+        return self.finish(request, response, counter, started)
+
+    async def __acall__(self, request):
+        if not settings.METRICS_ENABLED:
+            return await self.get_response(request)
+        counter, token, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _counter.reset(token)
+        return self.finish(request, response, counter, started)
+
+    def start(self):
+        counter = QueryCounter() if random.random() < settings.METRICS_SAMPLE_RATE else None
+        return counter, _counter.set(counter), time.perf_counter()
+
+    def finish(self, request, response, counter, started):
+        latency = time.perf_counter() - started
+        size = None if response.streaming else len(response.content)
+        registry.record(
+            (route_name(request), request.method, response.status_code), latency, size,
+            counter.count if counter is not None else None, counter.seconds if counter is not None else 0.0,
+        )
+        return response
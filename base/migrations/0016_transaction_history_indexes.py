@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-18 00:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0015_food_is_approved_featuredfood'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['sender', 'date'], name='transaction_sender_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['recipient', 'date'], name='transaction_recipient_date_idx'),
+        ),
+    ]
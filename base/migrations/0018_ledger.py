@@ -0,0 +1,60 @@
+# Generated by Django 4.1.7 on 2026-10-18 00:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def open_existing_balances(apps, schema_editor):
+    # Balances that predate the ledger become opening entries so that the
+    # ledger reconciles from day one.
+    CustomUser = apps.get_model('base', 'CustomUser')
+    LedgerEntry = apps.get_model('base', 'LedgerEntry')
+    entries = []
+    for user_id, balance in CustomUser.objects.exclude(balance=0).values_list('pk', 'balance').iterator():
+        entries.append(LedgerEntry(user_id=user_id, amount=balance, kind='opening'))
+        if len(entries) >= 1000:
+            LedgerEntry.objects.bulk_create(entries)
+            entries = []
+    LedgerEntry.objects.bulk_create(entries)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0017_notification_inbox'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('kind', models.CharField(choices=[('opening', 'Opening balance'), ('transfer', 'Transfer'), ('top_up', 'Top-up'), ('adjustment', 'Admin adjustment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('top_up', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='base.topuprequest')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='ledger_entries', to='base.transaction')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BalanceCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_id', models.BigIntegerField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_checkpoints', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['user', 'id'], name='ledger_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='balancecheckpoint',
+            index=models.Index(fields=['user', '-entry_id'], name='checkpoint_user_entry_idx'),
+        ),
+        migrations.RunPython(open_existing_balances, migrations.RunPython.noop),
+    ]
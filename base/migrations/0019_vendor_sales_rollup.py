@@ -0,0 +1,32 @@
+# Generated by Django 4.1.7 on 2026-10-18 00:52
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0018_ledger'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('items', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('paid_orders', models.PositiveIntegerField(default=0)),
+                ('paid_revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='base.food')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('vendor', 'day', 'food')},
+            },
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.1.7 on 2026-10-18 00:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0019_vendor_sales_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='topuprequest',
+            index=models.Index(fields=['user', 'created_at'], name='topup_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='topuprequest',
+            index=models.Index(condition=models.Q(('is_approved', False)), fields=['created_at', 'id'], name='topup_pending_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations
+
+# Kept in step with base/search.py.
+CREATE_TABLE_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS base_food_search USING fts5("
+    "name, description, category, canteen, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+INDEX_SELECT_SQL = (
+    "INSERT INTO base_food_search (rowid, name, description, category, canteen) "
+    "SELECT f.id, f.name, COALESCE(f.description, ''), c.name, ca.name FROM base_food f "
+    "INNER JOIN base_foodcategory c ON f.category_id = c.id INNER JOIN base_canteen ca ON c.canteen_id = ca.id"
+)
+
+
+def create_search_index(apps, schema_editor):
+    # FTS5 is SQLite only; elsewhere base.search falls back to icontains.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(CREATE_TABLE_SQL)
+        schema_editor.execute(INDEX_SELECT_SQL)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS base_food_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0020_top_up_request_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
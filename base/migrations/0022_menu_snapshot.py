@@ -0,0 +1,23 @@
+# Generated by Django 4.1.7 on 2026-10-18 01:08
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('base', '0021_food_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MenuSnapshot',
+            fields=[
+                ('canteen', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='menu_snapshot', serialize=False, to='base.canteen')),
+                ('etag', models.CharField(max_length=64)),
+                ('body', models.BinaryField()),
+                ('built_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -57,7 +57,10 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
         if self.height and self.weight:
             height_in_meters = self.height / 100
             self.bmi = round(self.weight / (height_in_meters ** 2), 2)
+        opening = self._state.adding and self.balance
         super().save(*args, **kwargs)
+        if opening:
+            LedgerEntry.objects.create(user=self, amount=self.balance, kind=LedgerEntry.OPENING)
 
 
 class Transaction(models.Model):
@@ -67,6 +70,12 @@ class Transaction(models.Model):
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['sender', 'date'], name='transaction_sender_date_idx'),
+            models.Index(fields=['recipient', 'date'], name='transaction_recipient_date_idx'),
+        ]
+
     def __str__(self):
         return f'Transaction of {self.amount} from {self.sender} to {self.recipient} on {self.date}'
 
@@ -75,17 +84,57 @@ class Notification(models.Model):
     title = models.CharField(max_length=100, default="No Title")
     message = models.TextField(default="No Message")
     created_at = models.DateTimeField(auto_now_add=True)
+    # Broadcasts go to everyone and are tracked with a per-user watermark;
+    # targeted notifications reach their recipients through InboxEntry rows.
+    is_broadcast = models.BooleanField(default=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_broadcast', 'id'], name='notification_broadcast_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
 
+class InboxEntry(models.Model):
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='inbox_entries', on_delete=models.CASCADE)
+    notification = models.ForeignKey(Notification, related_name='inbox_entries', on_delete=models.CASCADE)
+    is_read = models.BooleanField(default=False)
+
+    class Meta:
+        unique_together = ('user', 'notification')
+        indexes = [
+            models.Index(fields=['user', 'is_read'], name='inbox_user_unread_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.notification} for {self.user}"
+
+
+class NotificationWatermark(models.Model):
+    """The newest broadcast notification id a user has read."""
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, primary_key=True, related_name='notification_watermark',
+                                on_delete=models.CASCADE)
+    last_read_id = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user} read up to {self.last_read_id}"
+
+
 class TopUpRequest(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     is_approved = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='topup_user_created_idx'),
+            # Only pending requests are indexed, so the queue index stays small.
+            models.Index(fields=['created_at', 'id'], name='topup_pending_idx', condition=models.Q(is_approved=False)),
+        ]
+
     @property
     def user_first_name(self):
         return self.user.first_name
@@ -116,12 +165,29 @@ class Food(models.Model):
     vendor = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='vendor_foods', on_delete=models.CASCADE, null=True, blank=True)
     is_approved = models.BooleanField(default=False)
 
+    # is_approved as loaded from the database; None when unknown.
+    _loaded_is_approved = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_is_approved = instance.__dict__.get('is_approved')
+        return instance
+
     def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if self.is_approved:
-            FeaturedFood.objects.get_or_create(food=self)
+        # Featured status only needs syncing when approval changes. Bulk
+        # changes go through base.featured.set_approval instead.
+        if self._state.adding:
+            changed = self.is_approved
         else:
-            FeaturedFood.objects.filter(food=self).delete()
+            changed = self.is_approved != self._loaded_is_approved
+        super().save(*args, **kwargs)
+        if changed:
+            if self.is_approved:
+                FeaturedFood.objects.get_or_create(food=self)
+            else:
+                FeaturedFood.objects.filter(food=self).delete()
+        self._loaded_is_approved = self.is_approved
 
     def __str__(self):
         return self.name
@@ -143,3 +209,94 @@ class Order(models.Model):
 
     def __str__(self):
         return f"Order by {self.user} for {self.quantity}x {self.food.name}"
+
+
+# Ledger
+class LedgerEntry(models.Model):
+    """One change to a user's balance. Entries are never updated or deleted.
+
+    Every reference from an entry is PROTECT, so a user with money history
+    (or their transactions and top-ups) cannot be deleted; deactivate the
+    user with ``is_active = False`` instead.
+    """
+    OPENING = 'opening'
+    TRANSFER = 'transfer'
+    TOP_UP = 'top_up'
+    ADJUSTMENT = 'adjustment'
+    KIND_CHOICES = [
+        (OPENING, 'Opening balance'),
+        (TRANSFER, 'Transfer'),
+        (TOP_UP, 'Top-up'),
+        (ADJUSTMENT, 'Admin adjustment'),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='ledger_entries', on_delete=models.PROTECT)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    transaction = models.ForeignKey(Transaction, related_name='ledger_entries', on_delete=models.PROTECT,
+                                    null=True, blank=True)
+    top_up = models.ForeignKey(TopUpRequest, related_name='ledger_entries', on_delete=models.PROTECT,
+                               null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='ledger_user_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Ledger entries are append-only.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Ledger entries are append-only.")
+
+    def __str__(self):
+        return f"{self.get_kind_display()} of {self.amount} for {self.user}"
+
+
+class BalanceCheckpoint(models.Model):
+    """A user's verified balance as of ledger entry ``entry_id`` (inclusive)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='balance_checkpoints', on_delete=models.CASCADE)
+    entry_id = models.BigIntegerField()
+    balance = models.DecimalField(max_digits=12, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-entry_id'], name='checkpoint_user_entry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user}: {self.balance} at entry {self.entry_id}"
+
+
+# Vendor analytics
+class VendorSalesRollup(models.Model):
+    """Running sales totals for one vendor, food and day, kept up to date as orders come in."""
+    vendor = models.ForeignKey(settings.AUTH_USER_MODEL, related_name='sales_rollups', on_delete=models.CASCADE)
+    food = models.ForeignKey(Food, related_name='sales_rollups', on_delete=models.CASCADE)
+    day = models.DateField()
+    orders = models.PositiveIntegerField(default=0)
+    items = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    paid_orders = models.PositiveIntegerField(default=0)
+    paid_revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        unique_together = ('vendor', 'day', 'food')
+
+    def __str__(self):
+        return f"{self.vendor} - {self.food} on {self.day}"
+
+
+class MenuSnapshot(models.Model):
+    """A canteen's whole menu as one prebuilt, gzip-compressed JSON document."""
+    canteen = models.OneToOneField(Canteen, primary_key=True, related_name='menu_snapshot', on_delete=models.CASCADE)
+    etag = models.CharField(max_length=64)
+    body = models.BinaryField()
+    built_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Menu snapshot of {self.canteen_id} ({self.etag})"
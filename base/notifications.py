@@ -0,0 +1,239 @@
+"""Push delivery of new notifications as server-sent events.
+
+``NotificationStreamApp`` wraps the Django ASGI application and serves
+``/notifications/stream/`` itself, because Django 4.1 cannot stream from an
+async view. Each open stream sleeps until a Notification is committed in this
+process, then sends everything newer than the last id it delivered. Rows
+created by other workers are found by one poller per process, which reads the
+latest notification id every ``NOTIFICATION_STREAM_POLL_INTERVAL`` while any
+stream is open and wakes the streams when it moves; an idle stream therefore
+costs no queries of its own.
+"""
+import asyncio
+import io
+import json
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import DatabaseError, IntegrityError, close_old_connections, transaction
+from django.db.models import Max, Q
+from django.db.models.signals import post_save
+from rest_framework.exceptions import APIException
+from rest_framework.utils.encoders import JSONEncoder
+
+from .authentication import CachedJWTAuthentication
+from .models import Notification, InboxEntry, NotificationWatermark
+from .serializers import NotificationSerializer
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/notifications/stream/'
+
+
+class NotificationHub:
+    """Wakes every open stream in this process when a notification is created.
+
+    While anyone is subscribed it also runs the poller that notices rows
+    committed by other workers.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._poller = None
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        wake = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        subscriber = (loop, wake)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._poller is None or self._poller[1].done():
+                self._poller = (loop, loop.create_task(self.poll()))
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            if self._subscribers or self._poller is None:
+                return
+            (loop, task), self._poller = self._poller, None
+        if not loop.is_closed():
+            loop.call_soon_threadsafe(task.cancel)
+
+    async def poll(self):
+        latest = await latest_notification_id()
+        while True:
+            await asyncio.sleep(settings.NOTIFICATION_STREAM_POLL_INTERVAL)
+            try:
+                current = await latest_notification_id()
+            except DatabaseError:
+                logger.exception("Could not poll for new notifications.")
+                continue
+            if current != latest:
+                latest = current
+                self.publish()
+
+    def publish(self):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for loop, wake in subscribers:
+            # Signals fire on worker threads; the event belongs to the loop.
+            loop.call_soon_threadsafe(wake.set)
+
+
+hub = NotificationHub()
+
+
+def _publish_created(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(hub.publish)
+
+
+def connect_signals():
+    post_save.connect(_publish_created, sender=Notification, dispatch_uid='notification-stream-publish')
+
+
+async def latest_notification_id():
+    return (await Notification.objects.aaggregate(latest=Max('pk')))['latest'] or 0
+
+
+def visible_to(user):
+    """Broadcasts plus the notifications targeted at ``user``."""
+    return Notification.objects.filter(Q(is_broadcast=True) | Q(inbox_entries__user=user))
+
+
+def notify_users(user_ids, title, message):
+    """Create one targeted notification and an inbox entry per recipient."""
+    with transaction.atomic():
+        notification = Notification.objects.create(title=title, message=message, is_broadcast=False)
+        InboxEntry.objects.bulk_create(
+            [InboxEntry(user_id=user_id, notification=notification) for user_id in set(user_ids)]
+        )
+    return notification
+
+
+def unread_counts(user):
+    # Broadcast unread state is a single watermark per user, so the badge
+    # costs the same however many users there are.
+    watermark = NotificationWatermark.objects.filter(user=user).values_list('last_read_id', flat=True).first() or 0
+    broadcast = Notification.objects.filter(is_broadcast=True, pk__gt=watermark).count()
+    targeted = InboxEntry.objects.filter(user=user, is_read=False).count()
+    return {'broadcast': broadcast, 'targeted': targeted, 'total': broadcast + targeted}
+
+
+def mark_read(user, up_to=None, ids=None):
+    """Mark targeted ``ids`` read, and everything up to ``up_to`` if given.
+
+    Without arguments marks everything the user can currently see as read.
+    The broadcast watermark only ever moves forward.
+    """
+    if up_to is None and not ids:
+        up_to = Notification.objects.aggregate(latest=Max('pk'))['latest'] or 0
+
+    with transaction.atomic():
+        if ids:
+            InboxEntry.objects.filter(user=user, notification_id__in=ids, is_read=False).update(is_read=True)
+        if up_to is not None:
+            InboxEntry.objects.filter(user=user, notification_id__lte=up_to, is_read=False).update(is_read=True)
+            watermark = NotificationWatermark.objects.filter(user=user, last_read_id__lt=up_to)
+            if not watermark.update(last_read_id=up_to):
+                try:
+                    with transaction.atomic():
+                        NotificationWatermark.objects.create(user=user, last_read_id=up_to)
+                except IntegrityError:
+                    # It already exists: either further ahead, or created concurrently.
+                    watermark.update(last_read_id=up_to)
+
+
+def sse_event(notification):
+    data = json.dumps(NotificationSerializer(notification).data, cls=JSONEncoder, separators=(',', ':'))
+    return f'id: {notification.pk}\nevent: notification\ndata: {data}\n\n'.encode()
+
+
+async def newer_notifications(user, last_id, limit=100):
+    return [n async for n in visible_to(user).filter(pk__gt=last_id).order_by('pk')[:limit]]
+
+
+class NotificationStreamApp:
+    authenticator = CachedJWTAuthentication()
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == STREAM_PATH and scope['method'] == 'GET':
+            await self.stream(scope, receive, send)
+        else:
+            await self.application(scope, receive, send)
+
+    async def stream(self, scope, receive, send):
+        request = ASGIRequest(scope, io.BytesIO())
+        try:
+            result = await self.authenticator.aauthenticate(request)
+        except APIException as e:
+            result, detail = None, e.detail
+        else:
+            detail = "Authentication credentials were not provided."
+        if result is None:
+            body = json.dumps({'detail': detail}).encode()
+            await send({'type': 'http.response.start', 'status': 401, 'headers': [
+                (b'content-type', b'application/json'),
+                (b'www-authenticate', self.authenticator.authenticate_header(request).encode()),
+            ]})
+            await send({'type': 'http.response.body', 'body': body})
+            return
+
+        try:
+            last_id = int(request.headers.get('Last-Event-ID', ''))
+        except ValueError:
+            latest = await visible_to(result[0]).order_by('-pk').values_list('pk', flat=True).afirst()
+            last_id = latest or 0
+
+        await send({'type': 'http.response.start', 'status': 200, 'headers': [
+            (b'content-type', b'text/event-stream'),
+            (b'cache-control', b'no-cache'),
+            (b'x-accel-buffering', b'no'),
+        ]})
+
+        pushing = asyncio.ensure_future(self.push(send, result[0], last_id))
+        disconnected = asyncio.ensure_future(self.wait_for_disconnect(receive))
+        try:
+            await asyncio.wait({pushing, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            pushing.cancel()
+            disconnected.cancel()
+            await sync_to_async(close_old_connections)()
+        if pushing.done() and not pushing.cancelled() and pushing.exception():
+            raise pushing.exception()
+
+    async def wait_for_disconnect(self, receive):
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    async def push(self, send, user, last_id):
+        subscriber = hub.subscribe()
+        _, wake = subscriber
+        keepalive = settings.NOTIFICATION_STREAM_KEEPALIVE
+        try:
+            while True:
+                # Clear before reading so a publish during the query is not lost.
+                wake.clear()
+                notifications = await newer_notifications(user, last_id)
+                for notification in notifications:
+                    await send({'type': 'http.response.body', 'body': sse_event(notification), 'more_body': True})
+                    last_id = notification.pk
+                if notifications:
+                    continue
+
+                while True:
+                    try:
+                        await asyncio.wait_for(wake.wait(), timeout=keepalive)
+                        break
+                    except asyncio.TimeoutError:
+                        await send({'type': 'http.response.body', 'body': b': keepalive\n\n', 'more_body': True})
+        finally:
+            hub.unsubscribe(subscriber)
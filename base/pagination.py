@@ -0,0 +1,131 @@
+import heapq
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.conf import settings
+from django.db.models import Q
+from django.template import loader
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Newest-first pagination on ``(date, id)``.
+
+    Each page is read with ``WHERE (date, id) < cursor ORDER BY date DESC, id
+    DESC LIMIT n``, so the cost of a page does not depend on how deep into the
+    history it is. Several querysets can be paginated together; each is
+    limited on its own (and can use its own index) and the results are merged.
+    Set ``descending = False`` for oldest-first. As a DRF ``pagination_class``
+    it also draws a next-page link in the browsable API.
+    """
+    date_field = 'date'
+    descending = True
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = None
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+    template = 'rest_framework/pagination/previous_and_next.html'
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size or settings.TRANSACTION_PAGE_SIZE
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw_date, raw_id = urlsafe_b64decode(encoded.encode('ascii')).decode('ascii').rsplit('|', 1)
+            date = parse_datetime(raw_date)
+            pk = int(raw_id)
+        except (ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if date is None:
+            raise NotFound(self.invalid_cursor_message)
+        return date, pk
+
+    @staticmethod
+    def _get(obj, name):
+        # Rows are model instances, or dicts from a values() queryset that includes 'pk'.
+        return obj[name] if isinstance(obj, dict) else getattr(obj, name)
+
+    def encode_cursor(self, obj):
+        raw = f'{self._get(obj, self.date_field).isoformat()}|{self._get(obj, "pk")}'
+        return urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+
+    def _sort_key(self, obj):
+        return self._get(obj, self.date_field), self._get(obj, 'pk')
+
+    def paginate_querysets(self, querysets, request):
+        self.request = request
+        size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+
+        streams = []
+        for queryset in querysets:
+            if cursor is not None:
+                date, pk = cursor
+                after = 'lt' if self.descending else 'gt'
+                queryset = queryset.filter(
+                    Q(**{f'{self.date_field}__{after}': date}) | Q(**{self.date_field: date, f'pk__{after}': pk})
+                )
+            direction = '-' if self.descending else ''
+            streams.append(queryset.order_by(f'{direction}{self.date_field}', f'{direction}pk')[:size + 1])
+
+        seen = set()
+        rows = []
+        for obj in heapq.merge(*streams, key=self._sort_key, reverse=self.descending):
+            pk = self._get(obj, 'pk')
+            if pk in seen:
+                continue
+            seen.add(pk)
+            rows.append(obj)
+            if len(rows) > size:
+                break
+
+        self.next_cursor = self.encode_cursor(rows[size - 1]) if len(rows) > size else None
+        self.display_page_controls = self.next_cursor is not None
+        return rows[:size]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request)
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def to_html(self):
+        # Keyset pages only link forwards.
+        return loader.get_template(self.template).render({'previous_url': None, 'next_url': self.get_next_link()})
+
+
+class TopUpRequestPagination(KeysetPagination):
+    date_field = 'created_at'
+
+
+class PendingTopUpPagination(TopUpRequestPagination):
+    descending = False
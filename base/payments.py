@@ -0,0 +1,139 @@
+from django.db import connection, transaction
+from django.db.models import Case, DecimalField, Exists, F, OuterRef, Value, When
+
+from .analytics import record_payment
+from .authentication import forget_users
+from .ledger import record_transfer, record_top_up, record_top_ups
+from .models import CustomUser, Transaction, Order, TopUpRequest, LedgerEntry
+
+
+class TransferError(Exception):
+    pass
+
+
+class InsufficientBalance(TransferError):
+    pass
+
+
+def _lock_accounts(*user_ids):
+    # Lock both rows in primary key order so two opposite transfers between
+    # the same pair of users can never wait on each other. SQLite has no row
+    # locks; the conditional UPDATE below takes its database write lock.
+    if connection.features.has_select_for_update:
+        list(CustomUser.objects.select_for_update()
+             .filter(pk__in=user_ids)
+             .order_by('pk')
+             .values_list('pk', flat=True))
+
+
+def _move_funds(sender_id, recipient_id, amount):
+    # Must run inside transaction.atomic().
+    _lock_accounts(sender_id, recipient_id)
+
+    debited = CustomUser.objects.filter(pk=sender_id, balance__gte=amount) \
+        .update(balance=F('balance') - amount)
+    if not debited:
+        raise InsufficientBalance("Insufficient balance.")
+
+    CustomUser.objects.filter(pk=recipient_id).update(balance=F('balance') + amount)
+    # update() skips post_save, so drop cached request users explicitly.
+    transaction.on_commit(lambda: forget_users(sender_id, recipient_id))
+
+    txn = Transaction.objects.create(sender_id=sender_id, recipient_id=recipient_id, amount=amount)
+    record_transfer(txn)
+    return txn
+
+
+def transfer_funds(sender_id, recipient_id, amount):
+    """Move ``amount`` from one user to another and record the Transaction.
+
+    The debit is a single conditional UPDATE, so the balance check and the
+    write cannot be split by a concurrent transfer.
+    """
+    if amount <= 0:
+        raise TransferError("Amount must be greater than zero.")
+    if sender_id == recipient_id:
+        raise TransferError("Cannot transfer money to yourself.")
+
+    with transaction.atomic():
+        return _move_funds(sender_id, recipient_id, amount)
+
+
+def pay_order(order_id, buyer_id):
+    """Charge the buyer for an unpaid order and mark it paid, all or nothing.
+
+    Raises ``Order.DoesNotExist`` if the order does not belong to the buyer.
+    """
+    with transaction.atomic():
+        # Claiming the order first means a second concurrent payment finds
+        # nothing to claim instead of charging the buyer twice.
+        claimed = Order.objects.filter(pk=order_id, user_id=buyer_id, is_paid=False).update(is_paid=True)
+        order = Order.objects.only('total_price', 'vendor_id', 'food_id', 'created_at') \
+            .get(pk=order_id, user_id=buyer_id)
+        if not claimed:
+            raise TransferError("Order is already paid.")
+        if order.vendor_id is None:
+            raise TransferError("Order has no vendor to pay.")
+        if order.vendor_id == buyer_id:
+            raise TransferError("Cannot transfer money to yourself.")
+
+        txn = _move_funds(buyer_id, order.vendor_id, order.total_price)
+        record_payment(order)
+        return txn
+
+
+def approve_top_up(top_up_id):
+    """Approve a pending top-up and credit its user once.
+
+    Returns the TopUpRequest, or None if it was already approved or already
+    has its ledger credit.
+    """
+    with transaction.atomic():
+        claimed = TopUpRequest.objects.filter(pk=top_up_id, is_approved=False).update(is_approved=True)
+        if not claimed or LedgerEntry.objects.filter(top_up_id=top_up_id, kind=LedgerEntry.TOP_UP).exists():
+            return None
+        top_up = TopUpRequest.objects.get(pk=top_up_id)
+        CustomUser.objects.filter(pk=top_up.user_id).update(balance=F('balance') + top_up.amount)
+        record_top_up(top_up)
+        transaction.on_commit(lambda: forget_users(top_up.user_id))
+        return top_up
+
+
+def approve_top_ups(top_up_ids):
+    """Approve every pending top-up in ``top_up_ids`` in one transaction.
+
+    Amounts are summed per user and credited with a single UPDATE; requests
+    that are already approved are left alone. A pending request that already
+    has a top-up ledger entry was credited before, so it is marked approved
+    without a second credit. Returns the approved TopUpRequests.
+    """
+    with transaction.atomic():
+        pending = TopUpRequest.objects.filter(pk__in=list(top_up_ids), is_approved=False).annotate(
+            credited=Exists(LedgerEntry.objects.filter(top_up=OuterRef('pk'), kind=LedgerEntry.TOP_UP)),
+        )
+        if connection.features.has_select_for_update:
+            pending = pending.select_for_update()
+        claimable = list(pending.only('user_id', 'amount').order_by('pk'))
+        if not claimable:
+            return []
+
+        claimed = TopUpRequest.objects.filter(pk__in=[t.pk for t in claimable], is_approved=False) \
+            .update(is_approved=True)
+        if claimed != len(claimable):
+            raise TransferError("Top-up requests changed while they were being approved.")
+        top_ups = [top_up for top_up in claimable if not top_up.credited]
+        if not top_ups:
+            return []
+
+        totals = {}
+        for top_up in top_ups:
+            totals[top_up.user_id] = totals.get(top_up.user_id, 0) + top_up.amount
+        credit = Case(*[When(pk=user_id, then=Value(total)) for user_id, total in totals.items()],
+                      output_field=DecimalField(max_digits=10, decimal_places=2))
+        CustomUser.objects.filter(pk__in=list(totals)).update(balance=F('balance') + credit)
+
+        record_top_ups(top_ups)
+        transaction.on_commit(lambda: forget_users(*totals))
+        for top_up in top_ups:
+            top_up.is_approved = True
+        return top_ups
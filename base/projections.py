@@ -0,0 +1,98 @@
+"""Plain-value serialization for the hot list endpoints.
+
+``transactions/`` and ``orders/`` can return hundreds of rows per request,
+and running a ModelSerializer (with nested serializers) for each row costs
+more than the query. These functions read only the columns the serializers
+output, with ``values_list()``, and build the same dicts directly. Their
+output is byte-identical to ``TransactionSerializer`` and ``OrderSerializer``,
+which tests check. ``settings.PROJECTION_SERIALIZERS`` turns them on.
+"""
+from rest_framework import serializers
+
+from .localtime import LOCAL_TIMEZONE
+
+# Field instances are reused so values are formatted exactly like the serializers do.
+_money = serializers.DecimalField(max_digits=10, decimal_places=2)
+_datetime = serializers.DateTimeField()
+
+TRANSACTION_COLUMNS = ('pk', 'date', 'sender__email', 'recipient__email', 'amount')
+
+
+def local_minute(value):
+    """``value`` in LOCAL_TIMEZONE as ``'%Y-%m-%d %I:%M %p'``, without strftime."""
+    local = value.astimezone(LOCAL_TIMEZONE)
+    hour = local.hour % 12 or 12
+    return '%04d-%02d-%02d %02d:%02d %s' % (local.year, local.month, local.day, hour, local.minute,
+                                            'AM' if local.hour < 12 else 'PM')
+
+
+def transaction_row(row):
+    return {
+        'sender': row['sender__email'],
+        'recipient': row['recipient__email'],
+        'amount': _money.to_representation(row['amount']),
+        'date': local_minute(row['date']),
+    }
+
+
+ORDER_COLUMNS = (
+    'id', 'user__email', 'user__phone_number', 'quantity', 'total_price', 'created_at',
+    'vendor_id', 'vendor__email', 'vendor__phone_number', 'is_paid',
+    'food_id', 'food__name', 'food__description', 'food__price',
+    'food__category_id', 'food__category__name',
+    'food__category__canteen_id', 'food__category__canteen__name', 'food__category__canteen__description',
+    'food__vendor_id', 'food__vendor__email', 'food__vendor__phone_number',
+)
+
+
+def _user_str(email, phone_number):
+    # CustomUser.__str__
+    return email if email else phone_number
+
+
+def order_row(values):
+    (pk, user_email, user_phone, quantity, total_price, created_at,
+     vendor_id, vendor_email, vendor_phone, is_paid,
+     food_id, food_name, food_description, food_price,
+     category_id, category_name, canteen_id, canteen_name, canteen_description,
+     food_vendor_id, food_vendor_email, food_vendor_phone) = values
+
+    canteen = {'id': canteen_id, 'name': canteen_name, 'description': canteen_description}
+    food = {
+        'id': food_id,
+        'name': food_name,
+        'description': food_description,
+        'price': _money.to_representation(food_price),
+        'category': {'id': category_id, 'name': category_name, 'canteen': canteen},
+        'canteen': dict(canteen),
+        'vendor': None,
+    }
+    # A read-only dotted source through a missing relation is left out of
+    # the serializer output altogether, so the key is only set with a vendor.
+    if food_vendor_id is not None:
+        food['vendor'] = _user_str(food_vendor_email, food_vendor_phone)
+        food['vendor_phone_number'] = food_vendor_phone
+
+    row = {
+        'id': pk,
+        'user': _user_str(user_email, user_phone),
+        'user_phone_number': user_phone,
+        'food': food,
+        'quantity': quantity,
+        'total_price': _money.to_representation(total_price),
+        'created_at': _datetime.to_representation(created_at),
+        'vendor': None,
+    }
+    if vendor_id is not None:
+        row['vendor'] = _user_str(vendor_email, vendor_phone)
+        row['vendor_phone_number'] = vendor_phone
+    row['is_paid'] = is_paid
+    return row
+
+
+def order_rows(queryset):
+    return [order_row(values) for values in queryset.values_list(*ORDER_COLUMNS)]
+
+
+async def aorder_rows(queryset):
+    return [order_row(values) async for values in queryset.values_list(*ORDER_COLUMNS)]
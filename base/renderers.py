@@ -0,0 +1,44 @@
+"""JSON rendering through orjson, when it is installed.
+
+``FastJSONRenderer`` is a drop-in for DRF's ``JSONRenderer``: it produces the
+same bytes (compact, UTF-8, U+2028/U+2029 escaped) and hands anything orjson
+cannot encode the same way back to DRF's encoder. Without orjson, or when a
+client asks for indented output, it is DRF's renderer. It is selected through
+``REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES']``.
+"""
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# datetimes and dataclasses go through DRF's encoder so they are formatted
+# exactly as before (orjson would keep full microseconds, for one).
+ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+
+
+class FastJSONRenderer(JSONRenderer):
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not (self.compact and not self.ensure_ascii):
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(data, default=self.encoder.default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits or non-string dict keys.
+            return super().render(data, accepted_media_type, renderer_context)
+        # Same escaping as JSONRenderer, for JavaScript string literals.
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+def render_json(data):
+    """Render ``data`` with the first configured renderer, as the API views do."""
+    return api_settings.DEFAULT_RENDERER_CLASSES[0]().render(data)
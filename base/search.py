@@ -0,0 +1,121 @@
+"""Menu search.
+
+On SQLite the menu is indexed in ``base_food_search``, an FTS5 table with one
+row per Food (rowid = food id) holding the food's name and description and
+its category and canteen names. Signal handlers rewrite the affected rows
+whenever a Food, FoodCategory or Canteen is saved or deleted, inside the same
+transaction. Changes made with ``QuerySet.update()`` or ``bulk_create()``
+bypass the signals; ``rebuild_search_index`` repairs the table after those.
+
+Other databases fall back to unranked ``icontains`` matching.
+"""
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+
+from .models import Canteen, FoodCategory, Food
+
+SEARCH_TABLE = 'base_food_search'
+# bm25 column weights: name, description, category, canteen.
+WEIGHTS = (10.0, 1.0, 4.0, 2.0)
+
+# Kept in step with migration 0021.
+CREATE_TABLE_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5("
+    "name, description, category, canteen, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+)
+INDEX_SELECT_SQL = (
+    f"INSERT INTO {SEARCH_TABLE} (rowid, name, description, category, canteen) "
+    "SELECT f.id, f.name, COALESCE(f.description, ''), c.name, ca.name FROM base_food f "
+    "INNER JOIN base_foodcategory c ON f.category_id = c.id INNER JOIN base_canteen ca ON c.canteen_id = ca.id"
+)
+
+
+def uses_fts():
+    return connection.vendor == 'sqlite'
+
+
+def rebuild_index():
+    """Re-create every row of the search index from the menu tables."""
+    if not uses_fts():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE_SQL)
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+        cursor.execute(INDEX_SELECT_SQL)
+        return cursor.rowcount
+
+
+def reindex(foods):
+    """Rewrite the index rows for the Food queryset ``foods``."""
+    if not uses_fts():
+        return
+    sql, params = foods.values('pk').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({sql})", params)
+        cursor.execute(f"{INDEX_SELECT_SQL} WHERE f.id IN ({sql})", params)
+
+
+def unindex(food_id):
+    if uses_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", [food_id])
+
+
+def _food_saved(sender, instance, raw=False, **kwargs):
+    reindex(Food.objects.filter(pk=instance.pk))
+
+
+def _food_deleted(sender, instance, **kwargs):
+    unindex(instance.pk)
+
+
+def _category_saved(sender, instance, created, raw=False, **kwargs):
+    if not created:
+        reindex(Food.objects.filter(category_id=instance.pk))
+
+
+def _canteen_saved(sender, instance, created, raw=False, **kwargs):
+    if not created:
+        reindex(Food.objects.filter(category__canteen_id=instance.pk))
+
+
+def connect_signals():
+    # Deleting a category or canteen cascades to its foods, which sends
+    # post_delete for each of them.
+    post_save.connect(_food_saved, sender=Food, dispatch_uid='menu-search-food-save')
+    post_delete.connect(_food_deleted, sender=Food, dispatch_uid='menu-search-food-delete')
+    post_save.connect(_category_saved, sender=FoodCategory, dispatch_uid='menu-search-category-save')
+    post_save.connect(_canteen_saved, sender=Canteen, dispatch_uid='menu-search-canteen-save')
+
+
+def search_terms(text):
+    return re.findall(r'\w+', text.lower())[:10]
+
+
+def search_food_ids(text, offset, limit):
+    """Ids of the foods matching every word of ``text``, best match first.
+
+    Each word matches as a prefix, so "ado" finds "Adobo".
+    """
+    terms = search_terms(text)
+    if not terms:
+        return []
+    if not uses_fts():
+        foods = Food.objects.all()
+        for term in terms:
+            foods = foods.filter(Q(name__icontains=term) | Q(description__icontains=term)
+                                 | Q(category__name__icontains=term) | Q(category__canteen__name__icontains=term))
+        return list(foods.order_by('name', 'pk').values_list('pk', flat=True)[offset:offset + limit])
+
+    match = ' '.join(f'"{term}"*' for term in terms)
+    weights = ', '.join(str(weight) for weight in WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            f"ORDER BY bm25({SEARCH_TABLE}, {weights}), rowid LIMIT %s OFFSET %s",
+            [match, limit, offset],
+        )
+        return [row[0] for row in cursor.fetchall()]
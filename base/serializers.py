@@ -1,7 +1,10 @@
+from django.db import transaction
+from django.db.models import Q
 from rest_framework import serializers
+from .analytics import record_orders
+from .localtime import LOCAL_TIMEZONE
 from .models import CustomUser, Transaction, Notification, TopUpRequest, Canteen, FoodCategory, Food, Order, FeaturedFood
 from django.utils import timezone
-import pytz
 
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
@@ -79,15 +82,37 @@ class TransactionSerializer(serializers.ModelSerializer):
         fields = ['sender', 'recipient', 'amount', 'date']
 
     def get_date(self, obj):
-        local_tz = pytz.timezone('Asia/Manila')
         utc_date = obj.date
-        local_date = utc_date.astimezone(local_tz)
+        local_date = utc_date.astimezone(LOCAL_TIMEZONE)
         return local_date.strftime('%Y-%m-%d %I:%M %p')
 
 class NotificationSerializer(serializers.ModelSerializer):
+    # Optional: target the notification at these user ids instead of broadcasting it.
+    recipients = serializers.ListField(child=serializers.IntegerField(), write_only=True, required=False,
+                                       allow_empty=False)
+
     class Meta:
         model = Notification
-        fields = ['id', 'title', 'message', 'created_at']
+        fields = ['id', 'title', 'message', 'created_at', 'recipients']
+
+    def validate_recipients(self, value):
+        found = set(CustomUser.objects.filter(pk__in=value).values_list('pk', flat=True))
+        missing = sorted(set(value) - found)
+        if missing:
+            raise serializers.ValidationError(f"Users do not exist: {', '.join(map(str, missing))}.")
+        return value
+
+    def create(self, validated_data):
+        recipients = validated_data.pop('recipients', None)
+        if recipients:
+            from .notifications import notify_users
+            return notify_users(recipients, **validated_data)
+        return super().create(validated_data)
+
+
+class MarkNotificationsReadSerializer(serializers.Serializer):
+    up_to = serializers.IntegerField(min_value=0, required=False)
+    ids = serializers.ListField(child=serializers.IntegerField(), required=False)
 
 
 class TopUpRequestSerializer(serializers.ModelSerializer):
@@ -102,6 +127,23 @@ class TopUpRequestSerializer(serializers.ModelSerializer):
         return top_up_request
 
 
+class PendingTopUpRequestSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = TopUpRequest
+        fields = ['id', 'user', 'user_first_name', 'amount', 'created_at']
+        read_only_fields = fields
+
+
+class TopUpApprovalSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+
+
+class FoodApprovalSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+    is_approved = serializers.BooleanField()
+
+
 class UserDetailsSerializer(serializers.ModelSerializer):
     bmi = serializers.ReadOnlyField()
 
@@ -148,8 +190,18 @@ class FeaturedFoodSerializer(serializers.ModelSerializer):
         fields = ['food']
 
 
+def unpaid_orders(user):
+    """The orders that block ``user`` from placing another one.
+
+    Orders without a vendor can never be paid (pay_order refuses them), so
+    they do not count; otherwise an order left over from before vendor-less
+    foods were refused would lock the buyer out for good.
+    """
+    return Q(user=user, is_paid=False, vendor__isnull=False)
+
+
 class OrderSerializer(serializers.ModelSerializer):
-    food = serializers.PrimaryKeyRelatedField(queryset=Food.objects.all())
+    food = serializers.PrimaryKeyRelatedField(queryset=Food.objects.select_related('category__canteen', 'vendor'))
     user = serializers.StringRelatedField()
     user_phone_number = serializers.CharField(source='user.phone_number', read_only=True)
     vendor = serializers.StringRelatedField(allow_null=True)
@@ -161,8 +213,10 @@ class OrderSerializer(serializers.ModelSerializer):
         read_only_fields = ['user', 'total_price', 'created_at', 'vendor']
 
     def validate(self, data):
+        if data['food'].vendor_id is None:
+            raise serializers.ValidationError({'food': "This food has no vendor and cannot be ordered."})
         user = self.context['request'].user
-        existing_order = Order.objects.filter(user=user, is_paid=False).first()
+        existing_order = Order.objects.filter(unpaid_orders(user)).first()
         if existing_order:
             raise serializers.ValidationError(
                 "You have an existing unpaid order. Please pay for it before placing a new order.")
@@ -172,3 +226,72 @@ class OrderSerializer(serializers.ModelSerializer):
         representation = super().to_representation(instance)
         representation['food'] = FoodSerializer(instance.food).data
         return representation
+
+
+class CartLineSerializer(serializers.Serializer):
+    food = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class CartCheckoutSerializer(serializers.Serializer):
+    items = CartLineSerializer(many=True, allow_empty=False)
+
+    def validate(self, data):
+        user = self.context['request'].user
+        if Order.objects.filter(unpaid_orders(user)).exists():
+            raise serializers.ValidationError(
+                "You have an existing unpaid order. Please pay for it before placing a new order.")
+
+        quantities = {}
+        for line in data['items']:
+            quantities[line['food']] = quantities.get(line['food'], 0) + line['quantity']
+
+        foods = Food.objects.select_related('category__canteen', 'vendor').in_bulk(list(quantities))
+        missing = [pk for pk in quantities if pk not in foods]
+        if missing:
+            raise serializers.ValidationError({'items': f"Food does not exist: {', '.join(map(str, missing))}."})
+
+        unsold = [pk for pk in quantities if foods[pk].vendor_id is None]
+        if unsold:
+            raise serializers.ValidationError(
+                {'items': f"Food has no vendor and cannot be ordered: {', '.join(map(str, unsold))}."})
+
+        data['lines'] = [(foods[pk], quantity) for pk, quantity in quantities.items()]
+        return data
+
+    def create(self, validated_data):
+        user = self.context['request'].user
+        orders = [
+            Order(user=user, food=food, quantity=quantity, total_price=food.price * quantity, vendor=food.vendor)
+            for food, quantity in validated_data['lines']
+        ]
+        with transaction.atomic():
+            orders = Order.objects.bulk_create(orders)
+            # bulk_create sends no post_save, so add to the rollups here.
+            record_orders(orders)
+        return orders
+
+
+class SalesFiguresSerializer(serializers.Serializer):
+    orders = serializers.IntegerField()
+    items = serializers.IntegerField()
+    revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+    paid_orders = serializers.IntegerField()
+    paid_revenue = serializers.DecimalField(max_digits=12, decimal_places=2)
+
+
+class DailySalesSerializer(SalesFiguresSerializer):
+    day = serializers.DateField()
+
+
+class TopItemSerializer(SalesFiguresSerializer):
+    food = serializers.IntegerField()
+    name = serializers.CharField()
+
+
+class VendorAnalyticsSerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    totals = SalesFiguresSerializer()
+    daily = DailySalesSerializer(many=True)
+    top_items = TopItemSerializer(many=True)
@@ -1,3 +1,1609 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import threading
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import ScryptPasswordHasher, make_password
+from django.contrib.auth.models import Permission
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import ProtectedError
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.test import APIClient
+
+from .models import CustomUser, Transaction, Canteen, FoodCategory, Food, Order, Notification, TopUpRequest, \
+    LedgerEntry, BalanceCheckpoint, VendorSalesRollup, FeaturedFood
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import async_views
+from .authentication import forget_users
+from .notifications import NotificationStreamApp, hub, notify_users, unread_counts
+from .idempotency import IdempotencyStore, get_store
+from .ledger import ledger_balance
+from .menu_cache import get_menu_version
+from .metrics import MetricsMiddleware, registry
+from .middleware import CompressionMiddleware
+from .renderers import FastJSONRenderer
+from .throttling import forget_throttles
+from .payments import transfer_funds, approve_top_up, InsufficientBalance, TransferError
+
+
+class TransferTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com',
+                                                    password='pw', balance=Decimal('100.00'))
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com',
+                                                  password='pw', balance=Decimal('10.00'))
+        self.vendor = CustomUser.objects.create_user(phone_number='09170000003', email='vendor@example.com',
+                                                     password='pw', is_staff=True)
+
+    def test_transfer_funds_moves_balance_and_records_transaction(self):
+        transfer_funds(self.alice.pk, self.bob.pk, Decimal('40.00'))
+
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal('60.00'))
+        self.assertEqual(self.bob.balance, Decimal('50.00'))
+        self.assertTrue(Transaction.objects.filter(sender=self.alice, recipient=self.bob, amount=Decimal('40.00')).exists())
+
+    def test_transfer_funds_rejects_overdraft_without_side_effects(self):
+        with self.assertRaises(InsufficientBalance):
+            transfer_funds(self.bob.pk, self.alice.pk, Decimal('10.01'))
+
+        self.bob.refresh_from_db()
+        self.alice.refresh_from_db()
+        self.assertEqual(self.bob.balance, Decimal('10.00'))
+        self.assertEqual(self.alice.balance, Decimal('100.00'))
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_transfer_funds_rejects_non_positive_amount(self):
+        with self.assertRaises(TransferError):
+            transfer_funds(self.alice.pk, self.bob.pk, Decimal('-5.00'))
+
+    def test_transfer_view(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(reverse('user-transfer'),
+                                    {'recipient_phone_number': self.bob.phone_number, 'amount': '25.00'})
+
+        self.assertEqual(response.status_code, 200)
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.balance, Decimal('35.00'))
+
+    def test_transfer_view_to_self(self):
+        self.client.force_authenticate(self.alice)
+        response = self.client.post(reverse('user-transfer'),
+                                    {'recipient_phone_number': self.alice.phone_number, 'amount': '1.00'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], "Cannot transfer money to yourself.")
+
+    def test_vendor_charge_with_insufficient_balance(self):
+        self.client.force_authenticate(self.vendor)
+        response = self.client.post(reverse('transfer_buyer_and_vendor'),
+                                    {'recipient_phone_number': self.bob.phone_number, 'amount': '20.00'})
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['error'], "Buyer has insufficient balance.")
+
+
+class TransactionHistoryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com',
+                                                    password='pw', balance=Decimal('100.00'))
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com',
+                                                  password='pw', balance=Decimal('100.00'))
+        for amount in range(1, 6):
+            sender, recipient = (self.alice, self.bob) if amount % 2 else (self.bob, self.alice)
+            transfer_funds(sender.pk, recipient.pk, Decimal(amount))
+        self.client.force_authenticate(self.alice)
+
+    def test_pages_walk_history_newest_first(self):
+        amounts = []
+        url = reverse('user-transactions') + '?page_size=2'
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            amounts.extend(row['amount'] for row in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(amounts, ['5.00', '4.00', '3.00', '2.00', '1.00'])
+
+    def test_rows_carry_user_emails(self):
+        response = self.client.get(reverse('user-transactions'))
+
+        first = response.data['results'][0]
+        self.assertEqual(first['sender'], 'alice@example.com')
+        self.assertEqual(first['recipient'], 'bob@example.com')
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('user-transactions') + '?cursor=garbage')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class MenuQueryCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.vendor = CustomUser.objects.create_user(phone_number='09170000003', email='vendor@example.com',
+                                                     password='pw', is_staff=True)
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000004', email='buyer@example.com',
+                                                    password='pw')
+        canteen = Canteen.objects.create(name='Main Canteen')
+        self.category = FoodCategory.objects.create(name='Rice Meals', canteen=canteen)
+        for i in range(6):
+            food = Food.objects.create(name=f'Meal {i}', price=Decimal('55.00'), category=self.category,
+                                       vendor=self.vendor, is_approved=True)
+            Order.objects.create(user=self.buyer, food=food, quantity=1, total_price=food.price,
+                                 vendor=self.vendor, is_paid=True)
+        self.client.force_authenticate(self.buyer)
+
+    def test_food_list_query_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('food-list', args=[self.category.pk]))
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(response.data[0]['canteen']['name'], 'Main Canteen')
+        self.assertEqual(response.data[0]['vendor_phone_number'], '09170000003')
+
+    def test_featured_food_list_query_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('featured-food-list'))
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(response.data[0]['food']['category']['canteen']['name'], 'Main Canteen')
+
+    def test_order_list_query_count(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(response.data[0]['food']['vendor'], 'vendor@example.com')
+
+    def test_vendor_order_list_query_count(self):
+        self.client.force_authenticate(self.vendor)
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('order-list'))
+        self.assertEqual(response.data[0]['user'], 'buyer@example.com')
+
+
+class MenuCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(CustomUser.objects.create_user(phone_number='09170000004', password='pw'))
+        self.canteen = Canteen.objects.create(name='Main Canteen')
+
+    def test_second_request_is_served_from_cache(self):
+        self.client.get(reverse('canteen-list'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('canteen-list'))
+        self.assertEqual(response.data[0]['name'], 'Main Canteen')
+
+    def test_matching_etag_gets_304(self):
+        etag = self.client.get(reverse('canteen-list'))['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('canteen-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_menu_change_invalidates(self):
+        etag = self.client.get(reverse('canteen-list'))['ETag']
+        self.canteen.name = 'East Canteen'
+        self.canteen.save()
+
+        response = self.client.get(reverse('canteen-list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data[0]['name'], 'East Canteen')
+
+    def test_delete_invalidates(self):
+        category = FoodCategory.objects.create(name='Drinks', canteen=self.canteen)
+        url = reverse('food-category-list', args=[self.canteen.pk])
+        self.assertEqual(len(self.client.get(url).data), 1)
+
+        category.delete()
+        self.assertEqual(len(self.client.get(url).data), 0)
+
+
+class CartCheckoutTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000004', email='buyer@example.com', password='pw')
+        self.vendors = [
+            CustomUser.objects.create_user(phone_number=f'0917000001{i}', email=f'vendor{i}@example.com',
+                                           password='pw', is_staff=True)
+            for i in range(2)
+        ]
+        category = FoodCategory.objects.create(name='Rice Meals', canteen=Canteen.objects.create(name='Main Canteen'))
+        self.meal = Food.objects.create(name='Adobo', price=Decimal('55.00'), category=category, vendor=self.vendors[0])
+        self.rice = Food.objects.create(name='Rice', price=Decimal('15.00'), category=category, vendor=self.vendors[0])
+        self.drink = Food.objects.create(name='Iced Tea', price=Decimal('20.00'), category=category, vendor=self.vendors[1])
+        self.client.force_authenticate(self.buyer)
+
+    def checkout(self, items):
+        return self.client.post(reverse('cart-checkout'), {'items': items}, format='json')
+
+    def test_checkout_groups_lines_by_vendor(self):
+        items = [{'food': self.meal.pk, 'quantity': 1}, {'food': self.rice.pk, 'quantity': 2},
+                 {'food': self.drink.pk, 'quantity': 1}, {'food': self.meal.pk, 'quantity': 1}]
+        # 5 for the orders, 6 for the sales rollups: an update per line, then one insert.
+        with self.assertNumQueries(11):
+            response = self.checkout(items)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_price'], '160.00')
+        by_vendor = {group['vendor']: group for group in response.data['vendors']}
+        self.assertEqual(by_vendor['vendor0@example.com']['total_price'], '140.00')
+        self.assertEqual(len(by_vendor['vendor0@example.com']['orders']), 2)
+        self.assertEqual(by_vendor['vendor1@example.com']['total_price'], '20.00')
+        self.assertEqual(Order.objects.get(food=self.meal).quantity, 2)
+        self.assertEqual(Order.objects.filter(user=self.buyer, is_paid=False).count(), 3)
+
+    def test_unknown_food_creates_nothing(self):
+        response = self.checkout([{'food': self.meal.pk, 'quantity': 1}, {'food': 9999, 'quantity': 1}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Order.objects.exists())
+
+    def test_existing_unpaid_order_blocks_checkout(self):
+        Order.objects.create(user=self.buyer, food=self.meal, quantity=1, total_price=self.meal.price,
+                             vendor=self.vendors[0])
+
+        response = self.checkout([{'food': self.drink.pk, 'quantity': 1}])
+        self.assertEqual(response.status_code, 400)
+
+
+class OrderPaymentTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000004', email='buyer@example.com',
+                                                    password='pw', balance=Decimal('100.00'))
+        self.vendor = CustomUser.objects.create_user(phone_number='09170000003', email='vendor@example.com',
+                                                     password='pw', is_staff=True)
+        category = FoodCategory.objects.create(name='Rice Meals', canteen=Canteen.objects.create(name='Main Canteen'))
+        food = Food.objects.create(name='Adobo', price=Decimal('55.00'), category=category, vendor=self.vendor)
+        self.order = Order.objects.create(user=self.buyer, food=food, quantity=1, total_price=food.price,
+                                          vendor=self.vendor)
+        self.client.force_authenticate(self.buyer)
+
+    def pay(self):
+        return self.client.patch(reverse('order-pay', args=[self.order.pk]))
+
+    def test_pay_settles_funds_and_marks_paid(self):
+        response = self.pay()
+
+        self.assertEqual(response.status_code, 200)
+        self.order.refresh_from_db()
+        self.buyer.refresh_from_db()
+        self.vendor.refresh_from_db()
+        self.assertTrue(self.order.is_paid)
+        self.assertEqual(self.buyer.balance, Decimal('45.00'))
+        self.assertEqual(self.vendor.balance, Decimal('55.00'))
+        self.assertEqual(Transaction.objects.get().amount, Decimal('55.00'))
+
+    def test_second_payment_is_rejected(self):
+        self.pay()
+        response = self.pay()
+
+        self.assertEqual(response.status_code, 400)
+        self.buyer.refresh_from_db()
+        self.assertEqual(self.buyer.balance, Decimal('45.00'))
+
+    def test_insufficient_balance_leaves_order_unpaid(self):
+        CustomUser.objects.filter(pk=self.buyer.pk).update(balance=Decimal('10.00'))
+
+        response = self.pay()
+
+        self.assertEqual(response.status_code, 400)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_paid)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_foods_without_a_vendor_cannot_be_ordered(self):
+        self.pay()
+        food = Food.objects.create(name='Turon', price=Decimal('15.00'), category=self.order.food.category)
+
+        response = self.client.post(reverse('order-create'), {'food': food.pk, 'quantity': 1})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('food', response.data)
+        response = self.client.post(reverse('cart-checkout'), {'items': [{'food': food.pk, 'quantity': 1}]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('items', response.data)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_unpayable_order_does_not_block_new_orders(self):
+        self.pay()
+        food = Food.objects.create(name='Turon', price=Decimal('15.00'), category=self.order.food.category)
+        Order.objects.create(user=self.buyer, food=food, quantity=1, total_price=food.price)
+
+        response = self.client.post(reverse('order-create'), {'food': self.order.food_id, 'quantity': 1})
+
+        self.assertEqual(response.status_code, 201)
+
+    def test_put_is_not_allowed(self):
+        self.pay()
+        response = self.client.put(reverse('order-pay', args=[self.order.pk]), {'quantity': 50, 'is_paid': False})
+
+        self.assertEqual(response.status_code, 405)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.quantity, 1)
+        self.assertTrue(self.order.is_paid)
+
+    def test_only_the_buyer_can_pay(self):
+        self.client.force_authenticate(self.vendor)
+        response = self.pay()
+
+        self.assertEqual(response.status_code, 404)
+        self.order.refresh_from_db()
+        self.assertFalse(self.order.is_paid)
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        get_store().responses.clear()
+        self.client = APIClient()
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com',
+                                                    password='pw', balance=Decimal('100.00'))
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com', password='pw')
+        self.client.force_authenticate(self.alice)
+
+    def transfer(self, key):
+        return self.client.post(reverse('user-transfer'),
+                                {'recipient_phone_number': self.bob.phone_number, 'amount': '30.00'},
+                                HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_without_charging_again(self):
+        first = self.transfer('abc')
+        with self.assertNumQueries(0):
+            retry = self.transfer('abc')
+
+        self.assertEqual(retry.status_code, first.status_code)
+        self.assertEqual(retry.data, first.data)
+        self.assertEqual(retry['Idempotent-Replayed'], 'true')
+        self.assertEqual(Transaction.objects.count(), 1)
+
+    def test_key_reused_with_another_body_is_refused(self):
+        self.transfer('abc')
+        response = self.client.post(reverse('user-transfer'),
+                                    {'recipient_phone_number': self.bob.phone_number, 'amount': '60.00'},
+                                    HTTP_IDEMPOTENCY_KEY='abc')
+
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Transaction.objects.count(), 1)
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal('70.00'))
+
+    def test_new_key_runs_again(self):
+        self.transfer('abc')
+        self.transfer('def')
+
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_concurrent_requests_with_one_key_run_once(self):
+        store = IdempotencyStore()
+        release = threading.Event()
+        calls = []
+
+        def handler():
+            calls.append(1)
+            release.wait(5)
+            return Response({'ok': True})
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(store.run('key', handler))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([response.data for response in results], [{'ok': True}] * 4)
+
+
+class LoginTests(TestCase):
+    def setUp(self):
+        forget_throttles()
+        self.client = APIClient()
+        self.user = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com',
+                                                   password='secret')
+
+    def test_email_login_hashes_once_in_one_query(self):
+        with mock.patch.object(ScryptPasswordHasher, 'verify', autospec=True,
+                               side_effect=ScryptPasswordHasher.verify) as verify:
+            with self.assertNumQueries(1):
+                response = self.client.post(reverse('user-login'), {'email': 'alice@example.com', 'password': 'secret'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+        self.assertEqual(verify.call_count, 1)
+
+    def test_wrong_password(self):
+        response = self.client.post(reverse('user-login'), {'email': 'alice@example.com', 'password': 'nope'})
+
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.data['error'], "Invalid email or password")
+
+    def test_login_upgrades_legacy_hash(self):
+        CustomUser.objects.filter(pk=self.user.pk).update(password=make_password('secret', hasher='pbkdf2_sha256'))
+
+        response = self.client.post(reverse('user-login'), {'phone_number': '09170000001', 'password': 'secret'})
+
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith('scrypt$'))
+
+    def test_verify_user_by_phone(self):
+        with self.assertNumQueries(1):
+            response = self.client.post(reverse('verify-user'), {'phone_number': '09170000001', 'password': 'secret'})
+
+        self.assertEqual(response.status_code, 200)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com',
+                                                    password='pw', balance=Decimal('100.00'))
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com', password='pw')
+        forget_users(self.alice.pk, self.bob.pk)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(self.alice)}')
+
+    def test_repeat_requests_skip_the_user_query(self):
+        self.client.get(reverse('user-balance'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('user-balance'))
+        self.assertEqual(response.data['balance'], Decimal('100.00'))
+
+    def test_transfer_invalidates_cached_user(self):
+        self.client.get(reverse('user-balance'))
+        with self.captureOnCommitCallbacks(execute=True):
+            transfer_funds(self.alice.pk, self.bob.pk, Decimal('40.00'))
+
+        response = self.client.get(reverse('user-balance'))
+        self.assertEqual(response.data['balance'], Decimal('60.00'))
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(reverse('user-details'))
+        self.alice.is_active = False
+        self.alice.save()
+
+        response = self.client.get(reverse('user-details'))
+        self.assertEqual(response.status_code, 401)
+
+    def test_public_endpoints_ignore_credentials(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-a-token')
+        response = self.client.post(reverse('verify-user'), {'email': 'alice@example.com', 'password': 'pw'})
+        self.assertEqual(response.status_code, 200)
+
+
+class DatabaseProfileTests(TestCase):
+    def test_sqlite_profile_applies_connection_options(self):
+        if connection.settings_dict['ENGINE'] != 'base.db.backends.sqlite3':
+            self.skipTest("Tuned SQLite profile not in use.")
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+    def test_checked_in_database_is_not_switched_to_wal(self):
+        profile = settings.DATABASE_PROFILES['sqlite']
+        if profile['NAME'] != settings.DEV_SQLITE_PATH:
+            self.skipTest("SQLITE_PATH points at another database.")
+        self.assertNotIn('journal_mode', profile['OPTIONS']['init_command'])
+
+
+class AsyncReadViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.vendor = CustomUser.objects.create_user(phone_number='09170000003', email='vendor@example.com',
+                                                     password='pw', is_staff=True)
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000004', email='buyer@example.com',
+                                                    password='pw', balance=Decimal('80.00'))
+        forget_users(self.vendor.pk, self.buyer.pk)
+        self.category = FoodCategory.objects.create(name='Rice Meals', canteen=Canteen.objects.create(name='Main'))
+        food = Food.objects.create(name='Adobo', price=Decimal('55.00'), category=self.category,
+                                   vendor=self.vendor, is_approved=True)
+        Order.objects.create(user=self.buyer, food=food, quantity=2, total_price=Decimal('110.00'), vendor=self.vendor)
+        self.token = f'Bearer {AccessToken.for_user(self.buyer)}'
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=self.token)
+
+    async def call_async(self, view, path, **kwargs):
+        request = AsyncRequestFactory().get(path, AUTHORIZATION=self.token)
+        return await view.as_view()(request, **kwargs)
+
+    async def test_async_views_return_the_sync_body(self):
+        cases = [
+            ('canteen-list', {}, async_views.CanteenListView),
+            ('food-list', {'category_id': self.category.pk}, async_views.FoodListView),
+            ('featured-food-list', {}, async_views.FeaturedFoodListView),
+            ('user-balance', {}, async_views.UserBalanceView),
+            ('order-list', {}, async_views.OrderListView),
+        ]
+        for name, kwargs, view in cases:
+            path = reverse(name, kwargs=kwargs)
+            cache.clear()
+            async_response = await self.call_async(view, path, **kwargs)
+            cache.clear()
+            sync_response = await sync_to_async(self.client.get)(path)
+            with self.subTest(name):
+                self.assertEqual(async_response.status_code, 200)
+                self.assertEqual(async_response.content, sync_response.content)
+
+    async def test_concurrent_misses_build_once(self):
+        path = reverse('canteen-list')
+        build = async_views.AsyncMenuView.build
+        with mock.patch.object(async_views.AsyncMenuView, 'build', autospec=True, side_effect=build) as patched:
+            responses = await asyncio.gather(*(self.call_async(async_views.CanteenListView, path) for _ in range(5)))
+
+        self.assertEqual(patched.call_count, 1)
+        self.assertEqual({response.content for response in responses}, {responses[0].content})
+        self.assertIn(b'"name":"Main"', responses[0].content)
+
+    async def test_missing_token_is_rejected(self):
+        request = AsyncRequestFactory().get(reverse('user-balance'))
+        response = await async_views.UserBalanceView.as_view()(request)
+
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+
+
+class NotificationFeedTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com', password='pw')
+        forget_users(self.user.pk)
+        self.notifications = [Notification.objects.create(title=f'Notice {i}') for i in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_since_returns_only_newer_rows(self):
+        response = self.client.get(reverse('notifications-since'), {'since': self.notifications[1].pk, 'limit': 2})
+
+        self.assertEqual([n['title'] for n in response.data['results']], ['Notice 2', 'Notice 3'])
+        self.assertEqual(response.data['last_id'], self.notifications[3].pk)
+        self.assertTrue(response.data['has_more'])
+
+    def test_since_latest_is_empty(self):
+        response = self.client.get(reverse('notifications-since'), {'since': self.notifications[-1].pk})
+
+        self.assertEqual(response.data['results'], [])
+        self.assertEqual(response.data['last_id'], self.notifications[-1].pk)
+        self.assertFalse(response.data['has_more'])
+
+    async def open_stream(self, headers):
+        sent = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'method': 'GET', 'path': '/notifications/stream/', 'query_string': b'',
+                 'headers': headers, 'root_path': ''}
+        task = asyncio.ensure_future(NotificationStreamApp(None)(scope, receive, send))
+        return task, sent, disconnect
+
+    async def test_stream_resumes_from_last_event_id(self):
+        token = str(AccessToken.for_user(self.user))
+        headers = [(b'authorization', f'Bearer {token}'.encode()),
+                   (b'last-event-id', str(self.notifications[2].pk).encode())]
+        task, sent, disconnect = await self.open_stream(headers)
+        for _ in range(100):
+            if len(sent) >= 3:
+                break
+            await asyncio.sleep(0.01)
+        disconnect.set()
+        await task
+
+        self.assertEqual(sent[0]['status'], 200)
+        bodies = [message['body'].decode() for message in sent[1:]]
+        self.assertEqual(len(bodies), 2)
+        self.assertTrue(bodies[0].startswith(f'id: {self.notifications[3].pk}\nevent: notification\n'))
+        self.assertIn('"title":"Notice 4"', bodies[1])
+
+    async def test_stream_requires_token(self):
+        task, sent, disconnect = await self.open_stream([])
+        await task
+
+        self.assertEqual(sent[0]['status'], 401)
+
+    async def test_publish_wakes_subscribers(self):
+        subscriber = hub.subscribe()
+        try:
+            hub.publish()
+            await asyncio.wait_for(subscriber[1].wait(), timeout=1)
+        finally:
+            hub.unsubscribe(subscriber)
+
+    async def test_poller_wakes_subscribers_for_other_workers_rows(self):
+        with self.settings(NOTIFICATION_STREAM_POLL_INTERVAL=0.01):
+            subscriber = hub.subscribe()
+            try:
+                await asyncio.sleep(0.05)
+                # bulk_create sends no post_save, like a row committed by another worker.
+                await sync_to_async(Notification.objects.bulk_create)([Notification(title='Elsewhere')])
+                await asyncio.wait_for(subscriber[1].wait(), timeout=1)
+            finally:
+                hub.unsubscribe(subscriber)
+
+
+class NotificationInboxTests(TestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com', password='pw')
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com', password='pw')
+        self.broadcasts = [Notification.objects.create(title=f'Broadcast {i}') for i in range(3)]
+        self.private = notify_users([self.alice.pk], 'Your top-up was approved', 'PHP 100.00')
+        self.client = APIClient()
+        self.client.force_authenticate(self.alice)
+
+    def test_unread_counts(self):
+        with self.assertNumQueries(3):
+            counts = unread_counts(self.alice)
+
+        self.assertEqual(counts, {'broadcast': 3, 'targeted': 1, 'total': 4})
+        self.assertEqual(unread_counts(self.bob), {'broadcast': 3, 'targeted': 0, 'total': 3})
+
+    def test_mark_read_up_to_moves_watermark(self):
+        response = self.client.post(reverse('notifications-mark-read'), {'up_to': self.broadcasts[1].pk}, format='json')
+
+        self.assertEqual(response.data, {'broadcast': 1, 'targeted': 1, 'total': 2})
+
+        # Watermarks never move backwards.
+        self.client.post(reverse('notifications-mark-read'), {'up_to': 0}, format='json')
+        self.assertEqual(self.client.get(reverse('notifications-unread-count')).data['broadcast'], 1)
+
+    def test_mark_all_read(self):
+        response = self.client.post(reverse('notifications-mark-read'), {}, format='json')
+
+        self.assertEqual(response.data['total'], 0)
+
+    def test_mark_targeted_ids_read(self):
+        response = self.client.post(reverse('notifications-mark-read'), {'ids': [self.private.pk]}, format='json')
+
+        self.assertEqual(response.data, {'broadcast': 3, 'targeted': 0, 'total': 3})
+
+    def test_targeted_notifications_stay_private(self):
+        self.client.force_authenticate(self.bob)
+        titles = [n['title'] for n in self.client.get(reverse('notifications-detail')).data]
+
+        self.assertNotIn('Your top-up was approved', titles)
+        self.assertEqual(len(titles), 3)
+
+    def test_admin_can_target_recipients(self):
+        admin = CustomUser.objects.create_user(phone_number='09170000009', email='admin@example.com',
+                                               password='pw', is_staff=True)
+        self.client.force_authenticate(admin)
+        response = self.client.post(reverse('notifications-list-create'),
+                                    {'title': 'Hi Bob', 'message': 'Hello', 'recipients': [self.bob.pk]}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(unread_counts(self.bob)['targeted'], 1)
+        self.assertEqual(unread_counts(self.alice)['targeted'], 1)
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com',
+                                                    password='pw', balance=Decimal('100.00'))
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com', password='pw')
+        self.admin = CustomUser.objects.create_user(phone_number='09170000009', email='admin@example.com',
+                                                    password='pw', is_staff=True, is_superuser=True)
+
+    def test_every_balance_change_is_recorded(self):
+        transfer_funds(self.alice.pk, self.bob.pk, Decimal('30.00'))
+        top_up = TopUpRequest.objects.create(user=self.bob, amount=Decimal('50.00'))
+        approve_top_up(top_up.pk)
+
+        self.assertEqual(ledger_balance(self.alice.pk), Decimal('70.00'))
+        self.assertEqual(ledger_balance(self.bob.pk), Decimal('80.00'))
+        self.assertEqual(
+            list(LedgerEntry.objects.filter(user=self.bob).values_list('kind', flat=True)),
+            [LedgerEntry.TRANSFER, LedgerEntry.TOP_UP],
+        )
+
+    def test_top_up_is_credited_once(self):
+        top_up = TopUpRequest.objects.create(user=self.bob, amount=Decimal('50.00'))
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        for _ in range(2):
+            client.patch(reverse('top-up-request-detail', args=[top_up.pk]), {'is_approved': 'true'})
+
+        self.bob.refresh_from_db()
+        self.assertEqual(self.bob.balance, Decimal('50.00'))
+        self.assertEqual(LedgerEntry.objects.filter(top_up=top_up).count(), 1)
+
+    def test_approved_top_up_cannot_be_rejected(self):
+        top_up = TopUpRequest.objects.create(user=self.bob, amount=Decimal('50.00'))
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        url = reverse('top-up-request-detail', args=[top_up.pk])
+        client.patch(url, {'is_approved': 'true'})
+
+        response = client.patch(url, {'is_approved': 'false'})
+        self.assertEqual(response.status_code, 400)
+        client.patch(url, {'is_approved': 'true'})
+
+        self.client.force_login(self.admin)
+        self.client.post(reverse('admin:base_topuprequest_changelist'), {
+            'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '1',
+            'form-0-id': str(top_up.pk), '_save': 'Save',
+        })
+        self.client.post(reverse('admin:base_topuprequest_change', args=[top_up.pk]), {'_save': 'Save'})
+
+        top_up.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertTrue(top_up.is_approved)
+        self.assertEqual(self.bob.balance, Decimal('50.00'))
+        self.assertEqual(LedgerEntry.objects.filter(top_up=top_up).count(), 1)
+
+    def test_only_pending_top_ups_can_be_deleted(self):
+        approved = TopUpRequest.objects.create(user=self.bob, amount=Decimal('50.00'))
+        approve_top_up(approved.pk)
+        pending = TopUpRequest.objects.create(user=self.bob, amount=Decimal('20.00'))
+        client = APIClient()
+        client.force_authenticate(self.admin)
+
+        response = client.delete(reverse('top-up-request-detail', args=[approved.pk]))
+        self.assertEqual(response.status_code, 400)
+        response = client.delete(reverse('top-up-request-detail', args=[pending.pk]))
+        self.assertEqual(response.status_code, 204)
+
+        self.assertEqual(list(TopUpRequest.objects.values_list('pk', flat=True)), [approved.pk])
+        self.assertEqual(LedgerEntry.objects.filter(top_up=approved).count(), 1)
+
+    def test_users_with_money_history_cannot_be_deleted(self):
+        top_up = TopUpRequest.objects.create(user=self.bob, amount=Decimal('50.00'))
+        approve_top_up(top_up.pk)
+        newcomer = CustomUser.objects.create_user(phone_number='09170000005', email='new@example.com', password='pw')
+
+        for user in (self.alice, self.bob):
+            with self.assertRaises(ProtectedError):
+                user.delete()
+        newcomer.delete()
+
+        self.assertEqual(LedgerEntry.objects.count(), 2)
+
+    def test_admin_balance_edit_is_an_adjustment(self):
+        self.client.force_login(self.admin)
+        response = self.client.post(reverse('admin:base_customuser_changelist'), {
+            'form-TOTAL_FORMS': '1', 'form-INITIAL_FORMS': '1',
+            'form-0-id': str(self.alice.pk), 'form-0-balance': '120.00', '_save': 'Save',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        adjustment = LedgerEntry.objects.get(kind=LedgerEntry.ADJUSTMENT)
+        self.assertEqual(adjustment.amount, Decimal('20.00'))
+        self.assertEqual(ledger_balance(self.alice.pk), Decimal('120.00'))
+
+    def test_entries_are_append_only(self):
+        entry = LedgerEntry.objects.get(user=self.alice)
+        entry.amount = Decimal('1.00')
+        with self.assertRaises(ValueError):
+            entry.save()
+
+    def test_reconcile_writes_checkpoints(self):
+        transfer_funds(self.alice.pk, self.bob.pk, Decimal('30.00'))
+        call_command('reconcile_ledger', '--checkpoint', '--chunk-size', '1', stdout=io.StringIO())
+
+        checkpoint = BalanceCheckpoint.objects.get(user=self.alice)
+        self.assertEqual(checkpoint.balance, Decimal('70.00'))
+        transfer_funds(self.alice.pk, self.bob.pk, Decimal('5.00'))
+        self.assertEqual(ledger_balance(self.alice.pk), Decimal('65.00'))
+
+    def test_reconcile_reports_mismatch(self):
+        CustomUser.objects.filter(pk=self.bob.pk).update(balance=Decimal('999.00'))
+        out = io.StringIO()
+
+        with self.assertRaises(CommandError):
+            call_command('reconcile_ledger', stdout=out)
+        self.assertIn(f'user {self.bob.pk}: balance 999.00 != ledger 0.00', out.getvalue())
+
+
+class VendorAnalyticsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000001', email='buyer@example.com',
+                                                    password='pw', balance=Decimal('500.00'))
+        self.vendor = CustomUser.objects.create_user(phone_number='09170000002', email='vendor@example.com',
+                                                     password='pw', is_staff=True)
+        category = FoodCategory.objects.create(name='Rice Meals', canteen=Canteen.objects.create(name='Main Canteen'))
+        self.meal = Food.objects.create(name='Adobo', price=Decimal('55.00'), category=category, vendor=self.vendor)
+        self.drink = Food.objects.create(name='Iced Tea', price=Decimal('20.00'), category=category, vendor=self.vendor)
+
+    def place_orders(self):
+        self.client.force_authenticate(self.buyer)
+        self.client.post(reverse('order-create'), {'food': self.meal.pk, 'quantity': 2})
+        order = Order.objects.get()
+        self.client.patch(reverse('order-pay', args=[order.pk]))
+        self.client.post(reverse('cart-checkout'), {'items': [
+            {'food': self.meal.pk, 'quantity': 1}, {'food': self.drink.pk, 'quantity': 3},
+        ]}, format='json')
+
+    def analytics(self, **params):
+        self.client.force_authenticate(self.vendor)
+        return self.client.get(reverse('vendor-analytics'), params)
+
+    def test_rollups_follow_orders_and_payments(self):
+        self.place_orders()
+
+        meal = VendorSalesRollup.objects.get(food=self.meal)
+        self.assertEqual((meal.orders, meal.items, meal.revenue), (2, 3, Decimal('165.00')))
+        self.assertEqual((meal.paid_orders, meal.paid_revenue), (1, Decimal('110.00')))
+        self.assertEqual(VendorSalesRollup.objects.get(food=self.drink).revenue, Decimal('60.00'))
+
+    def test_analytics_reads_only_the_rollups(self):
+        self.place_orders()
+
+        with self.assertNumQueries(2):
+            response = self.analytics(days=7)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['totals'], {
+            'orders': 3, 'items': 6, 'revenue': '225.00', 'paid_orders': 1, 'paid_revenue': '110.00',
+        })
+        self.assertEqual(len(response.data['daily']), 1)
+        self.assertEqual([item['name'] for item in response.data['top_items']], ['Adobo', 'Iced Tea'])
+
+    def test_days_are_manila_days(self):
+        # 01:30 on 2 March in Manila.
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2026, 3, 1, 17, 30, tzinfo=dt_timezone.utc)):
+            self.place_orders()
+            response = self.analytics(days=1)
+
+        self.assertEqual(set(VendorSalesRollup.objects.values_list('day', flat=True)), {date(2026, 3, 2)})
+        self.assertEqual(response.data['end'], '2026-03-02')
+        self.assertEqual(response.data['totals']['orders'], 3)
+
+    def test_admin_cannot_mark_orders_paid(self):
+        self.place_orders()
+        order = Order.objects.get(food=self.drink)
+        admin_user = CustomUser.objects.create_user(phone_number='09170000009', email='admin@example.com',
+                                                    password='pw', is_staff=True, is_superuser=True)
+        self.client.force_login(admin_user)
+
+        response = self.client.post(reverse('admin:base_order_change', args=[order.pk]), {
+            'user': order.user_id, 'food': order.food_id, 'quantity': order.quantity,
+            'total_price': order.total_price, 'vendor': order.vendor_id, 'is_paid': 'on', '_save': 'Save',
+        })
+
+        self.assertEqual(response.status_code, 302)
+        order.refresh_from_db()
+        self.assertFalse(order.is_paid)
+        self.assertEqual(VendorSalesRollup.objects.get(food=self.drink).paid_orders, 0)
+
+    def test_analytics_is_for_vendors_only(self):
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get(reverse('vendor-analytics')).status_code, 403)
+
+    def test_backfill_rebuilds_the_rollups(self):
+        self.place_orders()
+        expected = sorted(VendorSalesRollup.objects.values_list('food_id', 'orders', 'items', 'revenue',
+                                                                 'paid_orders', 'paid_revenue'))
+        VendorSalesRollup.objects.update(orders=0, revenue=0)
+
+        call_command('backfill_sales_rollups', '--batch-size', '2', stdout=io.StringIO())
+
+        self.assertEqual(sorted(VendorSalesRollup.objects.values_list('food_id', 'orders', 'items', 'revenue',
+                                                                       'paid_orders', 'paid_revenue')), expected)
+
+
+class AdminQueryCountTests(TestCase):
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user(phone_number='09170000009', email='admin@example.com',
+                                                    password='pw', is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        self.users = []
+
+    def add_rows(self, count):
+        for _ in range(count):
+            i = len(self.users)
+            user = CustomUser.objects.create_user(phone_number=f'091800000{i:02}', email=f'user{i}@example.com',
+                                                  password='pw', balance=Decimal('10.00'))
+            self.users.append(user)
+            category = FoodCategory.objects.create(name=f'Category {i}', canteen=Canteen.objects.create(name=f'C{i}'))
+            food = Food.objects.create(name=f'Food {i}', price=Decimal('5.00'), category=category, vendor=self.admin,
+                                       is_approved=True)
+            Order.objects.create(user=user, food=food, quantity=1, total_price=food.price, vendor=self.admin)
+            TopUpRequest.objects.create(user=user, amount=Decimal('5.00'))
+            transfer_funds(user.pk, self.admin.pk, Decimal('1.00'))
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        return len(queries)
+
+    def test_changelists_do_not_query_per_row(self):
+        for model in ('topuprequest', 'transaction', 'order', 'food', 'foodcategory', 'featuredfood'):
+            with self.subTest(model=model):
+                url = reverse(f'admin:base_{model}_changelist')
+                self.add_rows(2)
+                self.client.get(url)  # The first request also updates the session.
+                few = self.count_queries(url)
+                self.add_rows(4)
+                self.assertEqual(self.count_queries(url), few)
+
+    def test_approve_selected_sums_per_user(self):
+        alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com', password='pw')
+        bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com', password='pw')
+        requests = [
+            TopUpRequest.objects.create(user=alice, amount=Decimal('20.00')),
+            TopUpRequest.objects.create(user=alice, amount=Decimal('30.00')),
+            TopUpRequest.objects.create(user=bob, amount=Decimal('15.00')),
+            TopUpRequest.objects.create(user=bob, amount=Decimal('99.00'), is_approved=True),
+        ]
+
+        response = self.client.post(reverse('admin:base_topuprequest_changelist'), {
+            'action': 'approve_selected', '_selected_action': [r.pk for r in requests],
+        }, follow=True)
+
+        self.assertContains(response, "Approved 3 top-up request(s) for 2 user(s).")
+        alice.refresh_from_db()
+        bob.refresh_from_db()
+        self.assertEqual((alice.balance, bob.balance), (Decimal('50.00'), Decimal('15.00')))
+        self.assertFalse(TopUpRequest.objects.filter(is_approved=False).exists())
+        self.assertEqual(ledger_balance(alice.pk), Decimal('50.00'))
+        self.assertEqual(LedgerEntry.objects.filter(kind=LedgerEntry.TOP_UP).count(), 3)
+
+
+class TopUpBulkApproveTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = CustomUser.objects.create_user(phone_number='09170000009', email='admin@example.com',
+                                                    password='pw', is_staff=True, is_superuser=True)
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com', password='pw')
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com', password='pw')
+        forget_users(self.admin.pk, self.alice.pk, self.bob.pk)
+        self.client.force_authenticate(self.admin)
+
+    def approve(self, ids):
+        return self.client.post(reverse('top-up-requests-approve'), {'ids': ids}, format='json')
+
+    def test_approves_in_one_batch_and_reports_each_request(self):
+        pending = [TopUpRequest.objects.create(user=user, amount=Decimal(amount))
+                   for user, amount in ((self.alice, '20.00'), (self.bob, '15.00'), (self.alice, '30.00'))]
+        done = TopUpRequest.objects.create(user=self.bob, amount=Decimal('99.00'), is_approved=True)
+        ids = [p.pk for p in pending] + [done.pk, 9999, pending[0].pk]
+
+        # Claim, credit both users and write the ledger with a fixed number of statements.
+        with self.assertNumQueries(7):
+            response = self.approve(ids)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['approved'], 3)
+        self.assertEqual([r['result'] for r in response.data['results']],
+                         ['approved', 'approved', 'approved', 'already_approved', 'not_found'])
+        self.alice.refresh_from_db()
+        self.bob.refresh_from_db()
+        self.assertEqual((self.alice.balance, self.bob.balance), (Decimal('50.00'), Decimal('15.00')))
+
+    def test_repeating_a_batch_credits_nothing(self):
+        top_up = TopUpRequest.objects.create(user=self.alice, amount=Decimal('20.00'))
+        self.approve([top_up.pk])
+
+        response = self.approve([top_up.pk])
+
+        self.assertEqual(response.data['results'], [{'id': top_up.pk, 'result': 'already_approved'}])
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal('20.00'))
+
+    def test_credited_request_reset_to_pending_is_not_credited_again(self):
+        top_ups = [TopUpRequest.objects.create(user=self.alice, amount=Decimal('20.00')) for _ in range(2)]
+        self.approve([top_ups[0].pk])
+        approve_top_up(top_ups[1].pk)
+        # Rejected before un-approval was refused, or reset with QuerySet.update().
+        TopUpRequest.objects.update(is_approved=False)
+
+        response = self.approve([top_ups[0].pk])
+        self.assertIsNone(approve_top_up(top_ups[1].pk))
+
+        self.assertEqual(response.data['results'], [{'id': top_ups[0].pk, 'result': 'already_approved'}])
+        self.assertFalse(TopUpRequest.objects.filter(is_approved=False).exists())
+        self.alice.refresh_from_db()
+        self.assertEqual(self.alice.balance, Decimal('40.00'))
+        self.assertEqual(LedgerEntry.objects.filter(user=self.alice).count(), 2)
+
+    def test_requires_staff(self):
+        self.client.force_authenticate(self.alice)
+        self.assertEqual(self.approve([1]).status_code, 403)
+
+    def test_vendors_cannot_credit_top_ups(self):
+        vendor = CustomUser.objects.create_user(phone_number='09170000003', email='vendor@example.com',
+                                                password='pw', is_staff=True)
+        top_up = TopUpRequest.objects.create(user=vendor, amount=Decimal('5000.00'))
+        self.client.force_authenticate(vendor)
+
+        self.assertEqual(self.approve([top_up.pk]).status_code, 403)
+        response = self.client.patch(reverse('top-up-request-detail', args=[top_up.pk]), {'is_approved': 'true'})
+        self.assertEqual(response.status_code, 403)
+
+        vendor.refresh_from_db()
+        self.assertEqual(vendor.balance, Decimal('0.00'))
+
+    def test_cashier_with_change_permission_can_approve(self):
+        cashier = CustomUser.objects.create_user(phone_number='09170000008', email='cashier@example.com',
+                                                 password='pw', is_staff=True)
+        cashier.user_permissions.add(Permission.objects.get(codename='change_topuprequest'))
+        top_up = TopUpRequest.objects.create(user=self.alice, amount=Decimal('20.00'))
+        self.client.force_authenticate(CustomUser.objects.get(pk=cashier.pk))
+
+        self.assertEqual(self.approve([top_up.pk]).data['approved'], 1)
+
+
+class TopUpRequestListTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = CustomUser.objects.create_user(phone_number='09170000009', email='admin@example.com',
+                                                    password='pw', is_staff=True, is_superuser=True)
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com', password='pw')
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com', password='pw')
+        forget_users(self.admin.pk, self.alice.pk, self.bob.pk)
+        for i in range(5):
+            TopUpRequest.objects.create(user=self.alice, amount=Decimal(10 + i))
+            TopUpRequest.objects.create(user=self.bob, amount=Decimal(20 + i), is_approved=i % 2 == 0)
+
+    def test_users_see_only_their_own_requests_page_by_page(self):
+        self.client.force_authenticate(self.alice)
+        url = reverse('top-up-requests-list') + '?page_size=2'
+        amounts = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            amounts += [r['amount'] for r in response.data['results']]
+            url = response.data['next']
+
+        self.assertEqual(amounts, ['14.00', '13.00', '12.00', '11.00', '10.00'])
+
+    def test_pending_queue_is_oldest_first(self):
+        self.client.force_authenticate(self.admin)
+        first = self.client.get(reverse('top-up-requests-pending'), {'page_size': 4})
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual([r['amount'] for r in first.data['results'] + second.data['results']],
+                         ['10.00', '11.00', '21.00', '12.00', '13.00', '23.00', '14.00'])
+        self.assertIsNone(second.data['next'])
+
+    def test_pending_queue_is_for_cashiers(self):
+        vendor = CustomUser.objects.create_user(phone_number='09170000003', email='vendor@example.com',
+                                                password='pw', is_staff=True)
+        for user in (self.alice, vendor):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get(reverse('top-up-requests-pending')).status_code, 403)
+
+    def test_browsable_api_renders_pages(self):
+        self.client.force_authenticate(self.admin)
+        for url in (reverse('top-up-requests-list'), reverse('top-up-requests-pending') + '?page_size=2'):
+            with self.subTest(url):
+                response = self.client.get(url, HTTP_ACCEPT='text/html')
+                self.assertEqual(response.status_code, 200)
+        self.assertIn('class="pager"', response.content.decode())
+
+    def test_pending_queue_uses_partial_index(self):
+        queryset = TopUpRequest.objects.filter(is_approved=False).order_by('created_at', 'pk')[:20]
+        self.assertIn('topup_pending_idx', queryset.explain())
+
+
+class ProjectionSerializerTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000001', email='buyer@example.com',
+                                                    password='pw', balance=Decimal('5000.00'))
+        self.vendor = CustomUser.objects.create_user(phone_number='09170000002', password='pw', is_staff=True)
+        canteen = Canteen.objects.create(name='Main Canteen', description='Ground floor — ñ')
+        category = FoodCategory.objects.create(name='Rice Meals', canteen=canteen)
+        foods = [
+            Food.objects.create(name='Adobo', price=Decimal('55.50'), category=category, vendor=self.vendor),
+            Food.objects.create(name='Tubig', description='Free water', price=Decimal('0'), category=category),
+        ]
+        for i, food in enumerate(foods * 2):
+            Order.objects.create(user=self.buyer, food=food, quantity=i + 1, total_price=food.price * (i + 1),
+                                 vendor=food.vendor, is_paid=i % 2 == 0)
+        for amount in ('1.00', '12.50', '1000.05'):
+            transfer_funds(self.buyer.pk, self.vendor.pk, Decimal(amount))
+        # Local times just after midnight, at noon and in the afternoon.
+        for pk, hour in zip(Transaction.objects.values_list('pk', flat=True), (16, 4, 7)):
+            Transaction.objects.filter(pk=pk).update(date=datetime(2024, 2, 29, hour, 5, 9, tzinfo=dt_timezone.utc))
+
+    def get_both(self, user, url):
+        self.client.force_authenticate(user)
+        with self.settings(PROJECTION_SERIALIZERS=False):
+            slow = self.client.get(url)
+        with self.settings(PROJECTION_SERIALIZERS=True):
+            fast = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        return slow.content, fast.content
+
+    def test_orders_are_byte_identical(self):
+        for user in (self.vendor, self.buyer):
+            slow, fast = self.get_both(user, reverse('order-list'))
+            self.assertEqual(fast, slow)
+        self.assertIn(b'"vendor":null', fast)
+
+    def test_transactions_are_byte_identical(self):
+        for url in ('?page_size=2', ''):
+            for user in (self.buyer, self.vendor):
+                slow, fast = self.get_both(user, reverse('user-transactions') + url)
+                self.assertEqual(fast, slow)
+        self.assertIn(b'12:05 AM', fast)
+        self.assertIn(b'12:05 PM', fast)
+
+    async def test_async_orders_are_byte_identical(self):
+        request = AsyncRequestFactory().get('/orders/', AUTHORIZATION=f'Bearer {AccessToken.for_user(self.buyer)}')
+        with self.settings(PROJECTION_SERIALIZERS=False):
+            slow = await async_views.OrderListView.as_view()(request)
+        with self.settings(PROJECTION_SERIALIZERS=True):
+            fast = await async_views.OrderListView.as_view()(request)
+        self.assertEqual(fast.content, slow.content)
+
+
+class ResponseEncodingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000001', email='buyer@example.com', password='pw')
+        vendor = CustomUser.objects.create_user(phone_number='09170000002', email='vendor@example.com', is_staff=True)
+        category = FoodCategory.objects.create(name='Rice Meals', canteen=Canteen.objects.create(name='Main Canteen'))
+        for i in range(20):
+            Food.objects.create(name=f'Meal {i}', price=Decimal('55.00'), category=category, vendor=vendor,
+                                is_approved=True)
+        self.client.force_authenticate(self.buyer)
+
+    def test_fast_renderer_matches_drf(self):
+        data = {
+            'text': 'Kape — ñ   "quoted"', 'price': Decimal('55.50'), 'none': None, 'flag': True,
+            'when': datetime(2024, 2, 29, 7, 5, 9, 123456, tzinfo=dt_timezone.utc), 'day': datetime(2024, 2, 29).date(),
+            'lazy': gettext_lazy('Not found.'), 'nested': [{'n': 1}, [1.5, -2]], 'big': 2 ** 70,
+        }
+        for value in (data, [data, data], 'plain', 1):
+            self.assertEqual(FastJSONRenderer().render(value), JSONRenderer().render(value))
+
+    def test_large_responses_are_gzipped(self):
+        plain = self.client.get(reverse('featured-food-list'))
+        response = self.client.get(reverse('featured-food-list'), HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(len(response.content), len(plain.content))
+
+    def test_compression_respects_accept_encoding_and_size(self):
+        refused = self.client.get(reverse('featured-food-list'), HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        small = self.client.get(reverse('user-balance'), HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertFalse(refused.has_header('Content-Encoding'))
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+    def test_weakened_etag_still_revalidates(self):
+        response = self.client.get(reverse('featured-food-list'), HTTP_ACCEPT_ENCODING='gzip')
+        self.assertTrue(response['ETag'].startswith('W/"'))
+
+        response = self.client.get(reverse('featured-food-list'), HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    async def test_compression_runs_natively_under_asgi(self):
+        body = b'{"menu": "' + b'adobo ' * 1000 + b'"}'
+
+        async def view(request):
+            return HttpResponse(body, content_type='application/json')
+
+        middleware = CompressionMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = await middleware(AsyncRequestFactory().get('/', ACCEPT_ENCODING='gzip'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), body)
+
+
+class MenuSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000001', email='buyer@example.com', password='pw')
+        self.client.force_authenticate(self.buyer)
+        self.canteen = Canteen.objects.create(name='Main Canteen')
+        self.category = FoodCategory.objects.create(name='Rice Meals', canteen=self.canteen)
+        snacks = FoodCategory.objects.create(name='Snacks', canteen=Canteen.objects.create(name='Kiosk'))
+        self.adobo = Food.objects.create(name='Chicken Adobo', price=Decimal('55.00'), category=self.category)
+        self.sinigang = Food.objects.create(name='Sinigang', description='Pork in tamarind broth, not adobo',
+                                            price=Decimal('60.00'), category=self.category)
+        self.turon = Food.objects.create(name='Turon', description='Banana roll', price=Decimal('15.00'),
+                                         category=snacks)
+
+    def search(self, q, **params):
+        response = self.client.get(reverse('menu-search'), {'q': q, **params})
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def names(self, q):
+        return [food['name'] for food in self.search(q).data['results']]
+
+    def test_ranks_name_matches_first_and_matches_prefixes(self):
+        self.assertEqual(self.names('adobo'), ['Chicken Adobo', 'Sinigang'])
+        self.assertEqual(self.names('ADO'), ['Chicken Adobo', 'Sinigang'])
+        self.assertEqual(self.names('banana kiosk'), ['Turon'])
+        self.assertEqual(self.names('rice'), ['Chicken Adobo', 'Sinigang'])
+        self.assertEqual(self.names('"*) OR'), [])
+
+    def test_index_follows_menu_changes(self):
+        self.canteen.name = 'Engineering Canteen'
+        self.canteen.save()
+        self.category.name = 'Ulam'
+        self.category.save()
+        self.turon.name = 'Turon with Langka'
+        self.turon.save()
+        self.sinigang.delete()
+
+        self.assertEqual(self.names('engineering'), ['Chicken Adobo'])
+        self.assertEqual(self.names('ulam'), ['Chicken Adobo'])
+        self.assertEqual(self.names('rice'), [])
+        self.assertEqual(self.names('langka'), ['Turon with Langka'])
+        self.assertEqual(self.names('tamarind'), [])
+
+        self.canteen.delete()
+        self.assertEqual(self.names('adobo'), [])
+
+    def test_pages(self):
+        Food.objects.bulk_create([
+            Food(name=f'Pancit {i}', price=Decimal('40.00'), category=self.category) for i in range(25)
+        ])
+        call_command('rebuild_search_index', stdout=io.StringIO())
+
+        first = self.search('pancit')
+        second = self.client.get(first.data['next'])
+
+        self.assertEqual(len(first.data['results']), 20)
+        self.assertEqual(len(second.data['results']), 5)
+        self.assertIsNone(second.data['next'])
+        self.assertEqual(first.data['results'][0]['canteen']['name'], 'Main Canteen')
+
+
+class CanteenMenuSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.buyer = CustomUser.objects.create_user(phone_number='09170000001', email='buyer@example.com', password='pw')
+        self.vendor = CustomUser.objects.create_user(phone_number='09170000002', email='vendor@example.com',
+                                                     is_staff=True)
+        self.client.force_authenticate(self.buyer)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.canteen = Canteen.objects.create(name='Main Canteen')
+            self.other = Canteen.objects.create(name='Kiosk')
+            self.rice = FoodCategory.objects.create(name='Rice Meals', canteen=self.canteen)
+            self.drinks = FoodCategory.objects.create(name='Drinks', canteen=self.canteen)
+            self.adobo = Food.objects.create(name='Adobo', price=Decimal('55.00'), category=self.rice,
+                                             vendor=self.vendor)
+            Food.objects.create(name='Iced Tea', price=Decimal('20.00'), category=self.drinks)
+
+    def menu(self, canteen=None, **headers):
+        return self.client.get(reverse('canteen-menu', args=[(canteen or self.canteen).pk]), **headers)
+
+    def test_whole_menu_without_orm_work(self):
+        with self.assertNumQueries(0):
+            response = self.menu()
+
+        menu = json.loads(response.content)
+        self.assertEqual([c['name'] for c in menu['categories']], ['Rice Meals', 'Drinks'])
+        self.assertEqual(menu['categories'][0]['foods'][0], {
+            'id': self.adobo.pk, 'name': 'Adobo', 'description': None, 'price': '55.00',
+            'vendor': 'vendor@example.com', 'vendor_phone_number': '09170000002',
+        })
+        self.assertIsNone(menu['categories'][1]['foods'][0]['vendor'])
+
+    def test_served_gzipped_and_revalidated(self):
+        plain = self.menu()
+        response = self.menu(HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(self.menu(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_only_changed_canteens_are_rebuilt(self):
+        etag, other_etag = self.menu()['ETag'], self.menu(self.other)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.adobo.name = 'Chicken Adobo'
+            self.adobo.save()
+            self.adobo.price = Decimal('60.00')
+            self.adobo.save()
+            self.adobo.category = FoodCategory.objects.create(name='Ulam', canteen=self.other)
+            self.adobo.save()
+
+        self.assertNotEqual(self.menu()['ETag'], etag)
+        self.assertNotIn(b'Adobo', self.menu().content)
+        self.assertNotEqual(self.menu(self.other)['ETag'], other_etag)
+        self.assertIn(b'"name":"Chicken Adobo","description":null,"price":"60.00"', self.menu(self.other).content)
+
+    def test_vendor_contact_change_rebuilds_their_menus(self):
+        etag, other_etag = self.menu()['ETag'], self.menu(self.other)['ETag']
+        version = get_menu_version()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.save(update_fields=['last_login'])
+        self.assertEqual(self.menu()['ETag'], etag)
+        self.assertEqual(get_menu_version(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.vendor.email = 'adobo@example.com'
+            self.vendor.save()
+
+        self.assertNotEqual(self.menu()['ETag'], etag)
+        self.assertIn(b'"vendor":"adobo@example.com"', self.menu().content)
+        self.assertEqual(self.menu(self.other)['ETag'], other_etag)
+        self.assertNotEqual(get_menu_version(), version)
+
+    def test_cold_cache_reads_the_stored_snapshot(self):
+        expected = self.menu().content
+        cache.clear()
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.menu().content, expected)
+
+    def test_deleted_canteen(self):
+        url = reverse('canteen-menu', args=[self.canteen.pk])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.canteen.delete()
+
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_rebuild_command_picks_up_bulk_changes(self):
+        self.menu()
+        Food.objects.bulk_create([Food(name='Lumpia', price=Decimal('10.00'), category=self.rice)])
+        self.assertNotIn(b'Lumpia', self.menu().content)
+
+        call_command('rebuild_menu_snapshots', stdout=io.StringIO())
+
+        self.assertIn(b'Lumpia', self.menu().content)
+
+
+class FeaturedFoodSyncTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = CustomUser.objects.create_user(phone_number='09170000009', email='admin@example.com',
+                                                    password='pw', is_staff=True, is_superuser=True)
+        forget_users(self.admin.pk)
+        category = FoodCategory.objects.create(name='Rice Meals', canteen=Canteen.objects.create(name='Main Canteen'))
+        self.foods = [Food.objects.create(name=f'Meal {i}', price=Decimal('50.00'), category=category)
+                      for i in range(4)]
+
+    def featured(self):
+        return sorted(FeaturedFood.objects.values_list('food_id', flat=True))
+
+    def test_save_syncs_only_when_approval_changes(self):
+        food = Food.objects.get(pk=self.foods[0].pk)
+        food.price = Decimal('55.00')
+        with CaptureQueriesContext(connection) as queries:
+            food.save()
+        self.assertFalse(any('base_featuredfood' in q['sql'] for q in queries.captured_queries))
+
+        food.is_approved = True
+        food.save()
+        self.assertEqual(self.featured(), [food.pk])
+        food.is_approved = False
+        food.save()
+        self.assertEqual(self.featured(), [])
+
+    def test_bulk_approval_api(self):
+        self.client.force_authenticate(self.admin)
+        ids = [food.pk for food in self.foods[:3]]
+
+        # One update, one select, one insert, plus the savepoints.
+        with self.assertNumQueries(5):
+            response = self.client.post(reverse('food-approval'), {'ids': ids, 'is_approved': True}, format='json')
+        self.assertEqual(response.data, {'changed': 3})
+        self.assertEqual(self.featured(), ids)
+
+        response = self.client.post(reverse('food-approval'), {'ids': ids[:2], 'is_approved': False}, format='json')
+        self.assertEqual(response.data, {'changed': 2})
+        self.assertEqual(self.featured(), ids[2:])
+        self.assertEqual(list(Food.objects.filter(is_approved=True).values_list('pk', flat=True)), ids[2:])
+
+    def test_bulk_approval_needs_change_food_permission(self):
+        vendor = CustomUser.objects.create_user(phone_number='09170000003', email='vendor@example.com',
+                                                password='pw', is_staff=True)
+        self.client.force_authenticate(vendor)
+        data = {'ids': [self.foods[0].pk], 'is_approved': True}
+
+        self.assertEqual(self.client.post(reverse('food-approval'), data, format='json').status_code, 403)
+        self.assertEqual(self.featured(), [])
+
+        vendor.user_permissions.add(Permission.objects.get(codename='change_food'))
+        vendor = CustomUser.objects.get(pk=vendor.pk)
+        self.client.force_authenticate(vendor)
+        self.assertEqual(self.client.post(reverse('food-approval'), data, format='json').status_code, 200)
+
+    def test_admin_action(self):
+        self.client.force_login(self.admin)
+        self.client.post(reverse('admin:base_food_changelist'), {
+            'action': 'approve_selected', '_selected_action': [self.foods[0].pk, self.foods[1].pk],
+        })
+        self.assertEqual(self.featured(), [self.foods[0].pk, self.foods[1].pk])
+
+    def test_repair_command_fixes_drift(self):
+        Food.objects.filter(pk__in=[self.foods[0].pk, self.foods[1].pk]).update(is_approved=True)
+        FeaturedFood.objects.create(food=self.foods[2])
+
+        out = io.StringIO()
+        call_command('sync_featured_foods', '--dry-run', stdout=out)
+        self.assertIn("2 approved foods are not featured, 1 featured foods are not approved.", out.getvalue())
+        call_command('sync_featured_foods', stdout=io.StringIO())
+
+        self.assertEqual(self.featured(), [self.foods[0].pk, self.foods[1].pk])
+
+
+@override_settings(THROTTLE_RATES={
+    'login': {'ip': '5/min', 'account': '2/min'},
+    'verify-password': {'account': '2/min'},
+    'transfer': {'account': '1/min'},
+})
+class ThrottleTests(TestCase):
+    def setUp(self):
+        forget_throttles()
+        self.client = APIClient()
+        self.alice = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com',
+                                                    password='secret', balance=Decimal('100.00'))
+        self.bob = CustomUser.objects.create_user(phone_number='09170000002', email='bob@example.com', password='pw')
+
+    def login(self, email, password='secret'):
+        return self.client.post(reverse('user-login'), {'email': email, 'password': password})
+
+    def test_account_bucket_rejects_before_hashing_or_queries(self):
+        self.assertEqual(self.login('alice@example.com', 'nope').status_code, 401)
+        self.assertEqual(self.login('Alice@example.com ', 'nope').status_code, 401)
+
+        with mock.patch.object(ScryptPasswordHasher, 'verify', autospec=True) as verify:
+            with self.assertNumQueries(0):
+                response = self.login('alice@example.com')
+        self.assertEqual(response.status_code, 429)
+        self.assertIn('Retry-After', response)
+        verify.assert_not_called()
+
+        # Another account from the same IP still has tokens.
+        self.assertEqual(self.login('bob@example.com', 'pw').status_code, 200)
+
+    def test_ip_bucket_covers_every_account(self):
+        for i in range(5):
+            self.login(f'user{i}@example.com')
+        self.assertEqual(self.login('bob@example.com', 'pw').status_code, 429)
+        self.assertEqual(self.client.post(reverse('user-login'), {'email': 'bob@example.com', 'password': 'pw'},
+                                          REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+    def test_rotating_forwarded_for_does_not_escape_ip_bucket(self):
+        statuses = [
+            self.client.post(reverse('user-login'), {'email': f'user{i}@example.com', 'password': 'x'},
+                             HTTP_X_FORWARDED_FOR=f'203.0.113.{i}').status_code
+            for i in range(7)
+        ]
+        self.assertEqual(statuses[5:], [429, 429])
+
+        with self.settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': None}):
+            response = self.client.post(reverse('user-login'), {'email': 'bob@example.com', 'password': 'pw'},
+                                        HTTP_X_FORWARDED_FOR='203.0.113.99')
+        self.assertEqual(response.status_code, 429)
+
+    def test_bucket_refills_over_time(self):
+        with mock.patch('base.throttling.time.time', return_value=1000.0):
+            self.login('alice@example.com')
+            self.login('alice@example.com')
+            self.assertEqual(self.login('alice@example.com').status_code, 429)
+        with mock.patch('base.throttling.time.time', return_value=1030.0):
+            self.assertEqual(self.login('alice@example.com').status_code, 200)
+
+    def test_verify_password_per_user(self):
+        self.client.force_authenticate(self.alice)
+        self.client.post(reverse('verify-password'), {'password': 'nope'})
+        self.client.post(reverse('verify-password'), {'password': 'nope'})
+
+        with mock.patch.object(CustomUser, 'check_password') as check_password:
+            response = self.client.post(reverse('verify-password'), {'password': 'secret'})
+        self.assertEqual(response.status_code, 429)
+        check_password.assert_not_called()
+
+    @override_settings(CACHES={
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+        'throttle': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'throttle'},
+    }, THROTTLE_SHARED_CACHE='throttle')
+    def test_shared_store_limits_across_workers(self):
+        self.client.force_authenticate(self.alice)
+        data = {'recipient_phone_number': self.bob.phone_number, 'amount': '10.00'}
+        self.assertEqual(self.client.post(reverse('user-transfer'), data).status_code, 200)
+
+        # A fresh worker has empty local buckets; the shared one still rejects.
+        forget_throttles()
+        response = self.client.post(reverse('transfer_buyer_and_vendor'), data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(Transaction.objects.count(), 1)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.client = APIClient()
+        self.admin = CustomUser.objects.create_user(phone_number='09170000009', email='admin@example.com',
+                                                    password='pw', is_staff=True, is_superuser=True)
+        self.user = CustomUser.objects.create_user(phone_number='09170000001', email='alice@example.com',
+                                                   password='pw')
+
+    def test_records_latency_queries_and_size_per_route(self):
+        self.client.force_authenticate(self.user)
+        for _ in range(3):
+            self.client.get(reverse('user-transactions'))
+        self.client.get('/api/no-such-route/')
+
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        body = response.content.decode()
+        labels = 'route="user-transactions",method="GET",status="200"'
+        self.assertIn(f'juanbytes_http_request_duration_seconds_count{{{labels}}} 3', body)
+        self.assertIn(f'juanbytes_http_request_db_queries_count{{{labels}}} 3', body)
+        self.assertIn(f'juanbytes_http_response_size_bytes_bucket{{{labels},le="+Inf"}} 3', body)
+        self.assertIn('route="unmatched",method="GET",status="404"', body)
+
+    def test_sampling_skips_query_counting(self):
+        self.client.force_authenticate(self.user)
+        with self.settings(METRICS_SAMPLE_RATE=0.0):
+            self.client.get(reverse('user-transactions'))
+
+        series = registry.series[('user-transactions', 'GET', 200)]
+        self.assertEqual(sum(series.latency.counts), 1)
+        self.assertEqual(sum(series.queries.counts), 0)
+
+    def test_series_are_bounded(self):
+        with mock.patch.object(registry, 'max_series', 1):
+            self.client.force_authenticate(self.user)
+            self.client.get(reverse('user-transactions'))
+            self.client.get(reverse('user-balance'))
+
+        self.assertEqual(len(registry.series), 1)
+        self.assertEqual(registry.dropped, 1)
+
+    def test_admin_only(self):
+        vendor = CustomUser.objects.create_user(phone_number='09170000003', email='vendor@example.com',
+                                                password='pw', is_staff=True)
+        for user in (self.user, vendor):
+            self.client.force_authenticate(user)
+            self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    def test_asgi_stack_needs_no_sync_adaptation(self):
+        # Django logs this for each sync-only middleware it wraps.
+        with self.assertNoLogs('django.request', 'DEBUG'):
+            ASGIHandler()
+
+    async def test_counts_async_orm_queries(self):
+        async def view(request):
+            await CustomUser.objects.acount()
+            await Food.objects.filter(is_approved=True).aexists()
+            return HttpResponse(b'ok')
+
+        middleware = MetricsMiddleware(view)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        await middleware(AsyncRequestFactory().get('/'))
+
+        series = registry.series[('unmatched', 'GET', 200)]
+        self.assertEqual(series.queries.sum, 2)
@@ -0,0 +1,192 @@
+"""Token-bucket throttles for the endpoints that burn CPU or move money.
+
+Each throttle scope (``login``, ``verify-user``, ``verify-password``,
+``transfer``, ``create-order``) has one bucket per client IP and one per
+account, with rates from ``settings.THROTTLE_RATES``. A rate of ``'10/min'``
+is a bucket of 10 requests that refills evenly over a minute, so a client may
+burst up to 10 and then sustain one request every six seconds.
+
+Buckets live in a bounded per-process store, which answers most requests
+without I/O. With several workers, set ``THROTTLE_SHARED_CACHE`` to a cache
+alias that every worker shares (file-based or database cache). A request
+that the local bucket allows is then also charged to the shared bucket, and a
+request the local bucket rejects never reaches the shared store. The shared
+store reads and writes without a lock, so concurrent workers may let a few
+extra requests through; it bounds load, it is not an exact counter.
+
+``ThrottledMixin`` runs the IP bucket, and the account bucket when the
+account comes from the request body, before authentication. Rejected
+requests therefore return 429 before any password hashing or query. Account
+buckets keyed on the authenticated user run right after authentication,
+before the view body.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """``'10/min'`` -> ``(10, 60)``: bucket capacity and seconds to refill it."""
+    count, _, period = rate.partition('/')
+    return int(count), PERIODS[period]
+
+
+def take_token(state, capacity, period, now):
+    """Charge one request to a bucket.
+
+    ``state`` is ``(tokens, timestamp)`` or None for a full bucket. Returns the
+    new state and how long to wait before retrying (0 when allowed).
+    """
+    tokens, stamp = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - stamp) * capacity / period)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) * period / capacity
+
+
+class LocalBuckets:
+    """Per-process buckets, holding at most ``maxsize`` least recently used keys.
+
+    An evicted bucket comes back full, which only ever errs towards allowing.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, period, now):
+        with self._lock:
+            state, wait = take_token(self._data.pop(key, None), capacity, period, now)
+            self._data[key] = state
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SharedBuckets:
+    """Buckets kept in a Django cache shared by every worker."""
+
+    def __init__(self, alias):
+        self.alias = alias
+
+    def take(self, key, capacity, period, now):
+        cache = caches[self.alias]
+        state, wait = take_token(cache.get(key), capacity, period, now)
+        # An untouched bucket is full again after one period.
+        cache.set(key, state, timeout=math.ceil(period))
+        return wait
+
+
+_local = LocalBuckets(settings.THROTTLE_MAX_KEYS)
+
+
+def forget_throttles():
+    """Refill every per-process bucket."""
+    _local.clear()
+
+
+def consume(key, rate):
+    """Charge one request to the bucket ``key``; returns seconds to wait, 0 if allowed."""
+    capacity, period = parse_rate(rate)
+    now = time.time()
+    wait = _local.take(key, capacity, period, now)
+    if wait or not settings.THROTTLE_SHARED_CACHE:
+        return wait
+    return SharedBuckets(settings.THROTTLE_SHARED_CACHE).take(key, capacity, period, now)
+
+
+class BucketThrottle(BaseThrottle):
+    """One token bucket per scope, kind (``ip`` or ``account``) and identity.
+
+    Keyed on the client IP; subclasses change ``kind`` and ``get_identity``.
+    """
+    kind = 'ip'
+    before_authentication = True
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.wait_time = None
+
+    def get_identity(self, request):
+        # With NUM_PROXIES unset DRF's get_ident() would key on the whole
+        # client-supplied X-Forwarded-For header, which a client can rotate.
+        if api_settings.NUM_PROXIES is None:
+            return request.META.get('REMOTE_ADDR')
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        rate = settings.THROTTLE_RATES.get(self.scope, {}).get(self.kind)
+        identity = self.get_identity(request) if rate else None
+        if identity is None:
+            return True
+        self.wait_time = consume(f'throttle:{self.scope}:{self.kind}:{identity}', rate)
+        return not self.wait_time
+
+    def wait(self):
+        return self.wait_time
+
+
+class CredentialThrottle(BucketThrottle):
+    """Account bucket for login-style endpoints, keyed on the submitted email or phone number."""
+    kind = 'account'
+
+    def get_identity(self, request):
+        data = request.data
+        if not hasattr(data, 'get'):
+            return None
+        email, phone_number = data.get('email'), data.get('phone_number')
+        if phone_number and isinstance(phone_number, str):
+            return 'phone:' + phone_number.strip()
+        if email and isinstance(email, str):
+            return 'email:' + email.strip().lower()
+        return None
+
+
+class UserThrottle(BucketThrottle):
+    """Account bucket keyed on the authenticated user."""
+    kind = 'account'
+    before_authentication = False
+
+    def get_identity(self, request):
+        user = request.user
+        return user.pk if user and user.is_authenticated else None
+
+
+class ThrottledMixin:
+    """Apply the IP and account buckets of ``throttle_scope`` to an APIView."""
+    throttle_scope = None
+    account_throttle_class = UserThrottle
+
+    def get_throttles(self):
+        return [BucketThrottle(self.throttle_scope), self.account_throttle_class(self.throttle_scope)]
+
+    def initial(self, request, *args, **kwargs):
+        self.run_throttles(request, before_authentication=True)
+        super().initial(request, *args, **kwargs)
+
+    def check_throttles(self, request):
+        # Called by APIView.initial() once the user is authenticated.
+        self.run_throttles(request, before_authentication=False)
+
+    def run_throttles(self, request, before_authentication):
+        durations = [
+            throttle.wait() for throttle in self.get_throttles()
+            if throttle.before_authentication == before_authentication and not throttle.allow_request(request, self)
+        ]
+        if durations:
+            self.throttled(request, max(durations))
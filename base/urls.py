@@ -1,8 +1,16 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
 from .views import UserRegistrationView, csrf_token_view, UserLoginView, UserBalanceView, UserDetailsView, TransferView,\
     PasswordVerificationView, TransactionListView, NotificationListCreateView, NotificationDetailView, TopUpRequestCreateView, TopUpRequestDetailView, UpdateHeightWeightView, \
-    CanteenListView, FoodCategoryListView, FoodListView, OrderCreateView, OrderListView, UpdateOrderPaymentStatusView, FeaturedFoodListView, UserVerificationView, TransferBuyerAndVendorView
+    CanteenListView, FoodCategoryListView, FoodListView, OrderCreateView, OrderListView, UpdateOrderPaymentStatusView, FeaturedFoodListView, UserVerificationView, TransferBuyerAndVendorView, \
+    CartCheckoutView, NotificationSinceView, NotificationUnreadCountView, NotificationMarkReadView, VendorAnalyticsView, \
+    TopUpRequestBulkApproveView, PendingTopUpRequestListView, MenuSearchView, \
+    CanteenMenuView, FoodApprovalView, MetricsView
+
+
+def read_view(sync_view, async_view):
+    return (async_view if settings.ASYNC_READ_VIEWS else sync_view).as_view()
 
 
 urlpatterns = [
@@ -10,7 +18,7 @@ urlpatterns = [
     path('register/', UserRegistrationView.as_view(), name='user-register'),
     path('csrf/', csrf_token_view, name='csrf_token'),
     path('login/', UserLoginView.as_view(), name='user-login'),
-    path('balance/', UserBalanceView.as_view(), name='user-balance'), 
+    path('balance/', read_view(UserBalanceView, async_views.UserBalanceView), name='user-balance'), 
     path('details/', UserDetailsView.as_view(), name='user-details'),
     path('transfer/', TransferView.as_view(), name='user-transfer'),
     path('transferbuyerandvendor/', TransferBuyerAndVendorView.as_view(), name='transfer_buyer_and_vendor'),
@@ -19,16 +27,28 @@ urlpatterns = [
     path('transactions/', TransactionListView.as_view(), name='user-transactions'),
     path('notifications/', NotificationListCreateView.as_view(), name='notifications-list-create'),
     path('notifications/details/', NotificationDetailView.as_view(), name='notifications-detail'),
+    path('notifications/since/', NotificationSinceView.as_view(), name='notifications-since'),
+    path('notifications/unread-count/', NotificationUnreadCountView.as_view(), name='notifications-unread-count'),
+    path('notifications/mark-read/', NotificationMarkReadView.as_view(), name='notifications-mark-read'),
+    # notifications/stream/ is served by base.notifications.NotificationStreamApp under ASGI.
     path('top-up-requests/', TopUpRequestCreateView.as_view(), name='top-up-requests-list'),
+    path('top-up-requests/pending/', PendingTopUpRequestListView.as_view(), name='top-up-requests-pending'),
+    path('top-up-requests/approve/', TopUpRequestBulkApproveView.as_view(), name='top-up-requests-approve'),
     path('top-up-requests/<int:pk>/', TopUpRequestDetailView.as_view(), name='top-up-request-detail'),
     path('update-height-weight/', UpdateHeightWeightView.as_view(), name='update-height-weight'),
 
-    path('canteens/', CanteenListView.as_view(), name='canteen-list'),
+    path('canteens/', read_view(CanteenListView, async_views.CanteenListView), name='canteen-list'),
+    path('canteens/<int:canteen_id>/menu/', CanteenMenuView.as_view(), name='canteen-menu'),
     path('canteens/<int:canteen_id>/categories/', FoodCategoryListView.as_view(), name='food-category-list'),
-    path('categories/<int:category_id>/foods/', FoodListView.as_view(), name='food-list'),
-    path('featured-foods/', FeaturedFoodListView.as_view(), name='featured-food-list'),
+    path('categories/<int:category_id>/foods/', read_view(FoodListView, async_views.FoodListView), name='food-list'),
+    path('featured-foods/', read_view(FeaturedFoodListView, async_views.FeaturedFoodListView), name='featured-food-list'),
+    path('foods/approval/', FoodApprovalView.as_view(), name='food-approval'),
+    path('search/', MenuSearchView.as_view(), name='menu-search'),
     path('create-order/', OrderCreateView.as_view(), name='order-create'),
-    path('orders/', OrderListView.as_view(), name='order-list'),
+    path('checkout/', CartCheckoutView.as_view(), name='cart-checkout'),
+    path('orders/', read_view(OrderListView, async_views.OrderListView), name='order-list'),
     path('orders/<int:pk>/pay/', UpdateOrderPaymentStatusView.as_view(), name='order-pay'),
+    path('vendor/analytics/', VendorAnalyticsView.as_view(), name='vendor-analytics'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
 
 ]
@@ -1,34 +1,78 @@
-from django.http import HttpResponse
+import gzip
+import logging
+
+from django.http import HttpResponse, HttpResponseNotModified
 from rest_framework import generics, serializers, status, permissions
 from .serializers import UserRegistrationSerializer, UserLoginSerializer, TransferSerializer, \
     PasswordVerificationSerializer, TransactionSerializer, NotificationSerializer, TopUpRequestSerializer, UpdateHeightWeightSerializer, \
-    CanteenSerializer, FoodCategorySerializer, FoodSerializer, OrderSerializer, FeaturedFoodSerializer, UserVerificationSerializer
+    CanteenSerializer, FoodCategorySerializer, FoodSerializer, OrderSerializer, FeaturedFoodSerializer, UserVerificationSerializer, \
+    CartCheckoutSerializer, MarkNotificationsReadSerializer, VendorAnalyticsSerializer, TopUpApprovalSerializer, \
+    PendingTopUpRequestSerializer, FoodApprovalSerializer
 from django.http import JsonResponse
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie, csrf_exempt
 from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
-from django.contrib.auth import authenticate
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
 from rest_framework.permissions import IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.db.models import ProtectedError
 from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
 from .models import Transaction, Notification, TopUpRequest, Canteen, FoodCategory, Food, Order, FeaturedFood
+from .authentication import authentication_profile
+from .accounts import find_user, check_credentials, authenticate_user
+from .analytics import vendor_summary
+from .featured import set_approval
+from .idempotency import idempotent
+from .localtime import LOCAL_TIMEZONE
+from .menu_cache import MenuCacheMixin, etag_matches, set_menu_headers
+from .menu_snapshot import get_snapshot
+from .metrics import registry
+from .middleware import accepted_encodings
+from .notifications import visible_to, unread_counts, mark_read
+from .pagination import KeysetPagination, TopUpRequestPagination, PendingTopUpPagination
+from .payments import transfer_funds, pay_order, approve_top_up, approve_top_ups, TransferError, InsufficientBalance
+from .projections import transaction_row, order_rows, TRANSACTION_COLUMNS
+from .search import search_food_ids
+from .throttling import ThrottledMixin, CredentialThrottle
 from rest_framework.permissions import IsAdminUser
+from rest_framework.utils.urls import replace_query_param
+from django.utils.cache import patch_vary_headers
 
 
 CustomUser = get_user_model()  
 
+logger = logging.getLogger(__name__)
+
+
+class ChangeModelPermission(permissions.DjangoModelPermissions):
+    """Require the view model's change permission, even to read or POST.
+
+    For the approval and cashier endpoints. IsAdminUser is not enough there:
+    it only checks is_staff, and vendors are staff.
+    """
+    perms_map = {
+        **permissions.DjangoModelPermissions.perms_map,
+        **{method: ['%(app_label)s.change_%(model_name)s'] for method in ('GET', 'OPTIONS', 'HEAD', 'POST')},
+    }
+
 
 class UserRegistrationView(generics.CreateAPIView):
     serializer_class = UserRegistrationSerializer
     permission_classes = [AllowAny]  
+    authentication_classes = authentication_profile('public')
 
 
 # @csrf_exempt
-class UserLoginView(APIView):
+class UserLoginView(ThrottledMixin, APIView):
     permission_classes = [AllowAny]
+    authentication_classes = authentication_profile('public')
+    throttle_scope = 'login'
+    account_throttle_class = CredentialThrottle
 
     def post(self, request):
         serializer = UserLoginSerializer(data=request.data)
@@ -37,33 +81,30 @@ class UserLoginView(APIView):
             phone_number = serializer.validated_data.get('phone_number')
             password = serializer.validated_data.get('password')
 
-            User = get_user_model()
-
-            user = None
             if phone_number:
-                try:
-                    user = User.objects.get(phone_number=phone_number)
-                except User.DoesNotExist:
+                user = find_user(phone_number=phone_number)
+                if user is None:
                     return Response({"error": "Invalid phone number"}, status=status.HTTP_401_UNAUTHORIZED)
-            elif email:
-                user = authenticate(request, email=email, password=password)
-                if not user:
-                    return Response({"error": "Invalid email or password"}, status=status.HTTP_401_UNAUTHORIZED)
+            else:
+                user = find_user(email=email)
 
-            if user and user.check_password(password):
+            if check_credentials(user, password):
                 refresh = RefreshToken.for_user(user)
                 return Response({
                     "refresh": str(refresh),
                     "access": str(refresh.access_token),
                 }, status=status.HTTP_200_OK)
-            else:
+            elif phone_number:
                 return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+            else:
+                return Response({"error": "Invalid email or password"}, status=status.HTTP_401_UNAUTHORIZED)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class UserBalanceView(APIView):
     permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
 
     def get(self, request):
         user = request.user
@@ -81,6 +122,7 @@ class UserBalanceView(APIView):
 
 class UserDetailsView(APIView):
     permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
 
     def get(self, request):
         user = request.user
@@ -105,8 +147,9 @@ class UserDetailsView(APIView):
             return Response({"error": "User not found"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class PasswordVerificationView(APIView):
+class PasswordVerificationView(ThrottledMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'verify-password'
 
     def post(self, request):
         serializer = PasswordVerificationSerializer(data=request.data)
@@ -120,12 +163,13 @@ class PasswordVerificationView(APIView):
                 return Response({"error": "Incorrect password"}, status=status.HTTP_400_BAD_REQUEST)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-from django.contrib.auth import authenticate
-
 User = get_user_model()
 
-class UserVerificationView(APIView):
+class UserVerificationView(ThrottledMixin, APIView):
     permission_classes = [AllowAny]
+    authentication_classes = authentication_profile('public')
+    throttle_scope = 'verify-user'
+    account_throttle_class = CredentialThrottle
 
     def post(self, request):
         serializer = UserVerificationSerializer(data=request.data)
@@ -134,21 +178,17 @@ class UserVerificationView(APIView):
             phone_number = serializer.validated_data.get('phone_number')
             password = serializer.validated_data.get('password')
 
-            User = get_user_model()
-            user = None
-
-            if phone_number:
-                user = User.objects.filter(phone_number=phone_number).first()
-            if email:
-                user = User.objects.filter(email=email).first()
-
-            if user and authenticate(email=user.email, password=password):
+            if authenticate_user(password, email=email, phone_number=phone_number):
                 return Response({"message": "User verified"}, status=status.HTTP_200_OK)
             else:
                 return Response({"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 
+class TransferView(ThrottledMixin, APIView):
+    throttle_scope = 'transfer'
 
-class TransferView(APIView):
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = TransferSerializer(data=request.data)
         if serializer.is_valid():
@@ -157,30 +197,24 @@ class TransferView(APIView):
 
             sender = request.user
             try:
-                recipient = User.objects.get(phone_number=recipient_phone_number)
+                recipient = User.objects.only('pk').get(phone_number=recipient_phone_number)
             except User.DoesNotExist:
                 return Response({"error": "Recipient does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
-            if sender == recipient:
-                return Response({"error": "Cannot transfer money to yourself."}, status=status.HTTP_400_BAD_REQUEST)
-
-            if sender.balance < amount:
-                return Response({"error": "Insufficient balance."}, status=status.HTTP_400_BAD_REQUEST)
-
-            sender.balance -= amount
-            recipient.balance += amount
-            sender.save()
-            recipient.save()
-
-            Transaction.objects.create(sender=sender, recipient=recipient, amount=amount)
+            try:
+                transfer_funds(sender.pk, recipient.pk, amount)
+            except TransferError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
             return Response({"message": "Transfer successful."}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TransferBuyerAndVendorView(APIView):
+class TransferBuyerAndVendorView(ThrottledMixin, APIView):
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'transfer'
 
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = TransferSerializer(data=request.data)
         if serializer.is_valid():
@@ -193,54 +227,117 @@ class TransferBuyerAndVendorView(APIView):
                                 status=status.HTTP_403_FORBIDDEN)
 
             try:
-                buyer = CustomUser.objects.get(phone_number=recipient_phone_number)
-                if buyer.is_staff:
-                    return Response({"error": "Recipient must be a buyer."}, status=status.HTTP_400_BAD_REQUEST)
-
-                if buyer.balance < amount:
-                    return Response({"error": "Buyer has insufficient balance."}, status=status.HTTP_400_BAD_REQUEST)
-
-                buyer.balance -= amount
-                vendor.balance += amount
-                buyer.save()
-                vendor.save()
+                buyer = CustomUser.objects.only('pk', 'is_staff').get(phone_number=recipient_phone_number)
+            except CustomUser.DoesNotExist:
+                return Response({"error": "Recipient does not exist."}, status=status.HTTP_400_BAD_REQUEST)
 
-                Transaction.objects.create(sender=buyer, recipient=vendor, amount=amount)
+            if buyer.is_staff:
+                return Response({"error": "Recipient must be a buyer."}, status=status.HTTP_400_BAD_REQUEST)
 
-                return Response({"message": "Transfer successful."}, status=status.HTTP_200_OK)
+            try:
+                transfer_funds(buyer.pk, vendor.pk, amount)
+            except InsufficientBalance:
+                return Response({"error": "Buyer has insufficient balance."}, status=status.HTTP_400_BAD_REQUEST)
+            except TransferError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            except CustomUser.DoesNotExist:
-                return Response({"error": "Recipient does not exist."}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({"message": "Transfer successful."}, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class TransactionListView(APIView):
+    authentication_classes = authentication_profile('token')
+
     def get(self, request, *args, **kwargs):
-        transactions = Transaction.objects.filter(sender=request.user) | Transaction.objects.filter(recipient=request.user)
-        serializer = TransactionSerializer(transactions, many=True)
-        return Response(serializer.data)
+        # One index range scan per side instead of an OR over the whole table.
+        if settings.PROJECTION_SERIALIZERS:
+            history = Transaction.objects.values(*TRANSACTION_COLUMNS)
+        else:
+            history = Transaction.objects.select_related('sender', 'recipient') \
+                .only('amount', 'date', 'sender__email', 'recipient__email')
+        paginator = KeysetPagination()
+        page = paginator.paginate_querysets(
+            [history.filter(sender=request.user), history.filter(recipient=request.user)], request
+        )
+        if settings.PROJECTION_SERIALIZERS:
+            return paginator.get_paginated_response([transaction_row(row) for row in page])
+        serializer = TransactionSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
 
 class NotificationListCreateView(generics.ListCreateAPIView):
     queryset = Notification.objects.all().order_by('-created_at')
     serializer_class = NotificationSerializer
     permission_classes = [IsAdminUser]
+    authentication_classes = authentication_profile('staff')
 
 
 class NotificationDetailView(generics.ListAPIView):
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
 
     def get_queryset(self):
         # Retrieve notifications for authenticated users
-        return Notification.objects.all().order_by('-created_at')
+        return visible_to(self.request.user).order_by('-created_at')
+
+
+class NotificationSinceView(APIView):
+    """Notifications newer than the client's last seen id, oldest first."""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
+    max_limit = 100
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = int(request.query_params.get('limit', settings.NOTIFICATION_PAGE_SIZE))
+        except ValueError:
+            return Response({"error": "'since' and 'limit' must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, self.max_limit))
+
+        notifications = list(visible_to(request.user).filter(pk__gt=since).order_by('pk')[:limit + 1])
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+        return Response({
+            'results': NotificationSerializer(notifications, many=True).data,
+            'last_id': notifications[-1].pk if notifications else since,
+            'has_more': has_more,
+        })
+
+
+class NotificationUnreadCountView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
+
+    def get(self, request):
+        return Response(unread_counts(request.user))
+
+
+class NotificationMarkReadView(APIView):
+    permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
+
+    def post(self, request):
+        serializer = MarkNotificationsReadSerializer(data=request.data)
+        if serializer.is_valid():
+            mark_read(request.user, **serializer.validated_data)
+            return Response(unread_counts(request.user), status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
 class TopUpRequestCreateView(generics.ListCreateAPIView):
-    queryset = TopUpRequest.objects.all()
     serializer_class = TopUpRequestSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = TopUpRequestPagination
+
+    def get_queryset(self):
+        return TopUpRequest.objects.filter(user=self.request.user).select_related('user')
+
+    @idempotent
+    def post(self, request, *args, **kwargs):
+        return super().post(request, *args, **kwargs)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)  
@@ -249,7 +346,8 @@ class TopUpRequestCreateView(generics.ListCreateAPIView):
 class TopUpRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
     queryset = TopUpRequest.objects.all()
     serializer_class = TopUpRequestSerializer
-    permission_classes = [IsAdminUser]
+    permission_classes = [ChangeModelPermission]
+    authentication_classes = authentication_profile('staff')
 
     def update(self, request, *args, **kwargs):
         top_up_request = self.get_object()
@@ -257,27 +355,76 @@ class TopUpRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
 
         is_approved = data.get('is_approved')
         if is_approved is not None:
-            if is_approved.lower() == 'true':  
+            if str(is_approved).lower() == 'true':  
+                if approve_top_up(top_up_request.pk):
+                    logger.info("Top-up %s approved: added %s to user %s's balance.",
+                                top_up_request.pk, top_up_request.amount, top_up_request.user_id)
                 top_up_request.is_approved = True
-                user = top_up_request.user
-
-                with transaction.atomic():
-                    user.balance += top_up_request.amount
-                    user.save()
-
-                    top_up_request.save()
-
-                print(f"Top-up approved: Added {top_up_request.amount} to {user.email}'s balance. New balance: {user.balance}")
 
+            elif top_up_request.is_approved:
+                # The credit is already in the balance and the ledger.
+                return Response({"error": "An approved top-up request cannot be rejected."},
+                                status=status.HTTP_400_BAD_REQUEST)
             else:
-                top_up_request.is_approved = False
-                top_up_request.save()
-                print("Top-up rejected")
+                logger.info("Top-up %s rejected.", top_up_request.pk)
 
             return Response(TopUpRequestSerializer(top_up_request).data)
         else:
             return Response({"error": "Field 'is_approved' is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+    def destroy(self, request, *args, **kwargs):
+        top_up_request = self.get_object()
+        error = Response({"error": "An approved top-up request cannot be deleted."},
+                         status=status.HTTP_400_BAD_REQUEST)
+        if top_up_request.is_approved:
+            return error
+        try:
+            top_up_request.delete()
+        except ProtectedError:
+            # Approved since get_object(); its ledger entry keeps it.
+            return error
+        logger.info("Top-up %s deleted.", top_up_request.pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PendingTopUpRequestListView(generics.ListAPIView):
+    """Unapproved top-up requests, oldest first, for the cashier queue."""
+    queryset = TopUpRequest.objects.filter(is_approved=False).select_related('user')
+    serializer_class = PendingTopUpRequestSerializer
+    permission_classes = [ChangeModelPermission]
+    authentication_classes = authentication_profile('staff')
+    pagination_class = PendingTopUpPagination
+
+
+class TopUpRequestBulkApproveView(APIView):
+    """Approve many top-up requests at once and report what happened to each."""
+    queryset = TopUpRequest.objects.none()
+    permission_classes = [ChangeModelPermission]
+    authentication_classes = authentication_profile('staff')
+
+    def post(self, request):
+        serializer = TopUpApprovalSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+
+        try:
+            approved = {top_up.pk for top_up in approve_top_ups(ids)}
+        except TransferError as e:
+            return Response({"error": str(e)}, status=status.HTTP_409_CONFLICT)
+        existing = set(TopUpRequest.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+        results = []
+        for pk in ids:
+            if pk in approved:
+                result = 'approved'
+            elif pk in existing:
+                result = 'already_approved'
+            else:
+                result = 'not_found'
+            results.append({'id': pk, 'result': result})
+        return Response({'approved': len(approved), 'results': results}, status=status.HTTP_200_OK)
+
 
 class UpdateHeightWeightView(APIView):
     permission_classes = [IsAuthenticated]
@@ -298,36 +445,120 @@ class UpdateHeightWeightView(APIView):
 
         return Response({"message": "Height and weight updated successfully"}, status=status.HTTP_200_OK)
 
-class CanteenListView(generics.ListAPIView):
+class CanteenListView(MenuCacheMixin, generics.ListAPIView):
     permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
     queryset = Canteen.objects.all()
     serializer_class = CanteenSerializer
 
 
-class FoodCategoryListView(generics.ListAPIView):
+class CanteenMenuView(APIView):
+    """A canteen with all its categories and foods, served from the prebuilt snapshot."""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
+
+    def get(self, request, canteen_id):
+        snapshot = get_snapshot(canteen_id)
+        if snapshot is None:
+            return Response({"error": "Canteen not found."}, status=status.HTTP_404_NOT_FOUND)
+        etag, body = snapshot
+
+        if etag_matches(request, etag):
+            response = HttpResponseNotModified()
+        elif 'gzip' in accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', '')):
+            # Stored gzipped, so most clients get the bytes as they are.
+            response = HttpResponse(body, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(body), content_type='application/json')
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return set_menu_headers(response, etag)
+
+
+class FoodCategoryListView(MenuCacheMixin, generics.ListAPIView):
     serializer_class = FoodCategorySerializer
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = authentication_profile('token')
 
     def get_queryset(self):
         canteen_id = self.kwargs['canteen_id']
-        return FoodCategory.objects.filter(canteen_id=canteen_id)
+        return FoodCategory.objects.filter(canteen_id=canteen_id).select_related('canteen')
 
-class FoodListView(generics.ListAPIView):
+class FoodListView(MenuCacheMixin, generics.ListAPIView):
     serializer_class = FoodSerializer
     permission_classes = [permissions.IsAuthenticated]
+    authentication_classes = authentication_profile('token')
 
     def get_queryset(self):
         category_id = self.kwargs['category_id']
-        return Food.objects.filter(category_id=category_id)
+        return Food.objects.filter(category_id=category_id).select_related('category__canteen', 'vendor')
 
-class FeaturedFoodListView(generics.ListAPIView):
-    queryset = FeaturedFood.objects.all()
+class FeaturedFoodListView(MenuCacheMixin, generics.ListAPIView):
+    queryset = FeaturedFood.objects.select_related('food__category__canteen', 'food__vendor')
     serializer_class = FeaturedFoodSerializer
     permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
+
+class FoodApprovalView(APIView):
+    """Approve (and feature) or unapprove (and unfeature) many foods at once.
+
+    Needs the ``change_food`` permission, like approving a food in the admin.
+    """
+    queryset = Food.objects.none()
+    permission_classes = [ChangeModelPermission]
+    authentication_classes = authentication_profile('staff')
+
+    def post(self, request):
+        serializer = FoodApprovalSerializer(data=request.data)
+        if serializer.is_valid():
+            changed = set_approval(serializer.validated_data['ids'], serializer.validated_data['is_approved'])
+            return Response({'changed': changed}, status=status.HTTP_200_OK)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class IsSuperUser(permissions.BasePermission):
+    # IsAdminUser only checks is_staff, which vendors have too.
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_superuser)
 
-class OrderCreateView(generics.CreateAPIView):
+
+class MetricsView(APIView):
+    """This worker's request metrics in Prometheus text format, for superusers."""
+    permission_classes = [IsSuperUser]
+    authentication_classes = authentication_profile('staff')
+
+    def get(self, request):
+        return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class MenuSearchView(APIView):
+    """Foods matching ``?q=`` in their name, description, category or canteen, best first."""
+    permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
+    max_page = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            page = int(request.query_params.get('page', 1))
+        except ValueError:
+            return Response({"error": "'page' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        page = max(1, min(page, self.max_page))
+        size = settings.SEARCH_PAGE_SIZE
+
+        ids = search_food_ids(query, offset=(page - 1) * size, limit=size + 1)
+        foods = Food.objects.select_related('category__canteen', 'vendor').in_bulk(ids[:size])
+        results = FoodSerializer([foods[pk] for pk in ids[:size] if pk in foods], many=True).data
+
+        next_url = None
+        if len(ids) > size and page < self.max_page:
+            next_url = replace_query_param(request.build_absolute_uri(), 'page', page + 1)
+        return Response({'next': next_url, 'results': results})
+
+class OrderCreateView(ThrottledMixin, generics.CreateAPIView):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    throttle_scope = 'create-order'
 
     def perform_create(self, serializer):
         food = serializer.validated_data['food']
@@ -338,28 +569,87 @@ class OrderCreateView(generics.CreateAPIView):
     def get_serializer_context(self):
         return {'request': self.request}
 
+class CartCheckoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        serializer = CartCheckoutSerializer(data=request.data, context={'request': request})
+        if serializer.is_valid():
+            orders = serializer.save()
+
+            vendors = {}
+            for order in orders:
+                group = vendors.setdefault(order.vendor_id, {
+                    'vendor': str(order.vendor) if order.vendor else None,
+                    'vendor_phone_number': order.vendor.phone_number if order.vendor else None,
+                    'total_price': Decimal('0.00'),
+                    'orders': [],
+                })
+                group['total_price'] += order.total_price
+                group['orders'].append(OrderSerializer(order, context={'request': request}).data)
+
+            total_price = sum((group['total_price'] for group in vendors.values()), Decimal('0.00'))
+            for group in vendors.values():
+                group['total_price'] = str(group['total_price'])
+
+            return Response({
+                'total_price': str(total_price),
+                'vendors': list(vendors.values()),
+            }, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
 class OrderListView(generics.ListAPIView):
     # queryset = Order.objects.all()
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    authentication_classes = authentication_profile('token')
 
     def get_queryset(self):
         user = self.request.user
+        orders = Order.objects.select_related('user', 'vendor', 'food__category__canteen', 'food__vendor')
         if user.is_staff:  
-            return Order.objects.filter(vendor=user).order_by('-created_at')
-        return Order.objects.filter(user=user).order_by('-created_at')
+            return orders.filter(vendor=user).order_by('-created_at')
+        return orders.filter(user=user).order_by('-created_at')
 
-class UpdateOrderPaymentStatusView(generics.UpdateAPIView):
-    queryset = Order.objects.all()
-    serializer_class = OrderSerializer
+    def list(self, request, *args, **kwargs):
+        if settings.PROJECTION_SERIALIZERS:
+            return Response(order_rows(self.get_queryset()))
+        return super().list(request, *args, **kwargs)
+
+class UpdateOrderPaymentStatusView(APIView):
+    # Paying is the only change a buyer may make to an order, so PUT is not routed.
     permission_classes = [IsAuthenticated]
 
+    @idempotent
     def patch(self, request, *args, **kwargs):
-        order = self.get_object()
-        order.is_paid = True
-        order.save()
+        try:
+            pay_order(self.kwargs['pk'], request.user.pk)
+        except Order.DoesNotExist:
+            return Response({"error": "Order not found."}, status=status.HTTP_404_NOT_FOUND)
+        except TransferError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
         return Response({"status": "payment updated"}, status=status.HTTP_200_OK)
 
+class VendorAnalyticsView(APIView):
+    """Daily sales and top items for the requesting vendor, read from the rollups."""
+    permission_classes = [IsAdminUser]
+    authentication_classes = authentication_profile('token')
+    max_top = 50
+
+    def get(self, request):
+        try:
+            days = int(request.query_params.get('days', settings.VENDOR_ANALYTICS_DAYS))
+            top = int(request.query_params.get('top', 10))
+        except ValueError:
+            return Response({"error": "'days' and 'top' must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        days = max(1, min(days, settings.VENDOR_ANALYTICS_MAX_DAYS))
+        top = max(1, min(top, self.max_top))
+
+        end = timezone.localdate(timezone=LOCAL_TIMEZONE)
+        start = end - timedelta(days=days - 1)
+        summary = vendor_summary(request.user, start, end, top=top)
+        return Response(VendorAnalyticsSerializer(summary).data)
+
 @ensure_csrf_cookie
 def csrf_token_view(request):
     # return JsonResponse({'csrfToken': get_token(request)})